@@ -0,0 +1,130 @@
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from db_connection import ConnectionManager
+from quantile_sketch import DEFAULT_MAX_EXACT, QuantileSketch
+from query_registry import QueryRegistry, check_as_of
+from streaming import RowStream
+
+PERCENTILES = (0.10, 0.25, 0.50, 0.75, 0.90)
+DEFAULT_BUCKET_WIDTH = 10000
+# In the column order of the current_salaries query
+DISTRIBUTION_GROUPS = ('department', 'title', 'gender')
+
+
+class OverviewStats(NamedTuple):
+    """Company-wide figures shown on the analytics cards"""
+    total_employees: int
+    total_departments: int
+    total_managers: int
+    avg_salary: Optional[float]
+
+
+class DepartmentSummary(NamedTuple):
+    """Headcount and salary figures for one department, current or as of a date"""
+    dept_name: str
+    total_employees: int
+    avg_salary: Optional[float]
+    max_salary: Optional[int]
+    min_salary: Optional[int]
+    managers_count: int
+
+
+class SalaryDistribution(NamedTuple):
+    """Current salary percentiles and histogram of one department, title or gender"""
+    group: str
+    value: str
+    employees: int
+    p10: Optional[int]
+    p25: Optional[int]
+    median: Optional[int]
+    p75: Optional[int]
+    p90: Optional[int]
+    # Counts per bucket of SalaryDistributions.bucket_width
+    histogram: List[int]
+    # False once the group outgrew exact counting (percentiles within 0.5%)
+    exact: bool
+
+
+class SalaryDistributions(NamedTuple):
+    """Histogram bucket i covers [bucket_start + i * bucket_width, ... + bucket_width)"""
+    bucket_start: int
+    bucket_width: int
+    groups: List[SalaryDistribution]
+
+
+class AnalyticsEngine:
+    """Compute analytics in a fixed number of queries, independent of department count
+
+    With snapshot (a callable returning a columnar.ColumnarSnapshot), the
+    current department breakdown is computed in memory instead.
+    """
+
+    def __init__(self, db: ConnectionManager, queries: QueryRegistry, snapshot: Optional[Callable] = None):
+        self.db = db
+        self.queries = queries
+        self.snapshot = snapshot
+
+    def overview(self, as_of: Optional[str] = None) -> OverviewStats:
+        """Employee, department and manager counts plus the average current salary
+
+        With an as_of date (YYYY-MM-DD) the figures are those of that day:
+        employees hired by then, managers and average salary of the staff
+        at the time.
+        """
+        as_of = check_as_of(as_of)
+        if as_of:
+            row = self.queries.execute(self.db.connection(), 'analytics_overview_as_of', (as_of,))[0]
+        else:
+            row = self.queries.execute(self.db.connection(), 'analytics_overview')[0]
+        return OverviewStats(*row)
+
+    def department_breakdown(self, as_of: Optional[str] = None) -> List[DepartmentSummary]:
+        """Statistics for every department from a single grouped pass"""
+        as_of = check_as_of(as_of)
+        if as_of:
+            rows = self.queries.execute(self.db.connection(), 'department_breakdown_as_of', (as_of,))
+        elif self.snapshot is not None:
+            return self.snapshot().department_breakdown()
+        else:
+            rows = self.queries.execute(self.db.connection(), 'department_breakdown')
+        return [DepartmentSummary(*row) for row in rows]
+
+    def salary_distributions(self, bucket_width: int = DEFAULT_BUCKET_WIDTH,
+                             max_exact: int = DEFAULT_MAX_EXACT) -> SalaryDistributions:
+        """Percentiles and histograms of current salaries per department, title and gender
+
+        One streamed pass over the current salaries feeds every group's
+        QuantileSketch and bucket counts; nothing is sorted but each
+        group's distinct values (or sketch buckets) once at the end.
+        """
+        if bucket_width < 1:
+            raise ValueError("bucket_width must be at least 1")
+        sketches: Dict[Tuple[str, str], QuantileSketch] = {}
+        buckets: Dict[Tuple[str, str], Dict[int, int]] = {}
+        stream = RowStream(self.db.connection(), self.queries.sql('current_salaries'), log=self.queries.log)
+        with stream:
+            for row in stream:
+                salary = row[3]
+                bucket = salary // bucket_width
+                for key in zip(DISTRIBUTION_GROUPS, row):
+                    if key[1] is None:
+                        continue
+                    sketch = sketches.get(key)
+                    if sketch is None:
+                        sketch = sketches[key] = QuantileSketch(max_exact=max_exact)
+                        buckets[key] = {}
+                    sketch.add(salary)
+                    counts = buckets[key]
+                    counts[bucket] = counts.get(bucket, 0) + 1
+
+        used = [bucket for counts in buckets.values() for bucket in counts]
+        first, last = (min(used), max(used)) if used else (0, -1)
+        groups = []
+        for group in DISTRIBUTION_GROUPS:
+            for key in sorted(key for key in sketches if key[0] == group):
+                sketch, counts = sketches[key], buckets[key]
+                groups.append(SalaryDistribution(
+                    group, key[1], sketch.count, *sketch.quantiles(PERCENTILES),
+                    [counts.get(bucket, 0) for bucket in range(first, last + 1)], sketch.exact
+                ))
+        return SalaryDistributions(first * bucket_width, bucket_width, groups)
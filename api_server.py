@@ -0,0 +1,306 @@
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from db_migrations import database_argument
+from db_connection import DEFAULT_MMAP_SIZE
+from employee_data import DatabaseConfig, EmployeeData
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page
+from query_log import log_slow_queries
+from query_registry import check_as_of
+
+# The API is for dashboards and scripts on this machine only
+HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+DETAIL_COLUMNS = ('emp_no', 'first_name', 'last_name', 'gender', 'birth_date', 'hire_date',
+                  'title', 'salary', 'dept_name', 'manager_from')
+DEPARTMENT_COLUMNS = ('emp_no', 'first_name', 'last_name', 'title', 'salary', 'hire_date', 'is_manager')
+SEARCH_COLUMNS = ('emp_no', 'first_name', 'last_name', 'gender', 'birth_date', 'hire_date',
+                  'title', 'salary', 'dept_name')
+STATS_COLUMNS = ('total_employees', 'avg_salary', 'max_salary', 'min_salary', 'managers_count')
+
+
+def records(columns: Sequence[str], rows: List[Tuple]) -> List[dict]:
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def page_json(columns: Sequence[str], page: Page) -> dict:
+    return {'rows': records(columns, page.rows), 'next_token': page.next_token, 'has_more': page.has_more}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """JSON endpoints over EmployeeData
+
+    GET /employees/<emp_no>[?as_of=]
+    GET /departments
+    GET /departments/<name>/employees[?page_size=&page_token= | ?as_of=]
+    GET /departments/<name>/stats[?as_of=]
+    GET /search?q=<term>[&page_size=&page_token=]
+    GET /analytics[?as_of=]
+    GET /debug/queries[?limit=]   (top statements by total time)
+
+    as_of (YYYY-MM-DD) answers for that date instead of the current state.
+    A department listing without paging parameters is streamed as one
+    chunked JSON array, read from a RowStream a batch at a time.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'EmployeeAPI/1.0'
+    # Seconds a slow client may hold a worker while sending its request
+    timeout = 30
+    STREAM_BATCH_SIZE = 500
+
+    ROUTES = [
+        (re.compile(r'^/employees/(\d+)$'), 'employee'),
+        (re.compile(r'^/departments$'), 'departments'),
+        (re.compile(r'^/departments/([^/]+)/employees$'), 'department_employees'),
+        (re.compile(r'^/departments/([^/]+)/stats$'), 'department_stats'),
+        (re.compile(r'^/search$'), 'search'),
+        (re.compile(r'^/analytics$'), 'analytics'),
+        (re.compile(r'^/debug/queries$'), 'query_stats'),
+    ]
+
+    @property
+    def data(self) -> EmployeeData:
+        return self.server.data
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.query = parse_qs(url.query)
+        self.streaming = False
+        for pattern, name in self.ROUTES:
+            match = pattern.match(url.path)
+            if not match:
+                continue
+            try:
+                getattr(self, 'get_' + name)(*[unquote(group) for group in match.groups()])
+            except ValueError as e:
+                self.send_json(400, {'error': str(e)})
+            except sqlite3.Error as e:
+                if self.streaming:
+                    # Headers are gone; dropping the connection without the final
+                    # chunk tells the client the body is incomplete
+                    self.close_connection = True
+                    self.log_error("Aborted stream: %s", e)
+                else:
+                    self.send_json(500, {'error': f"Database error: {e}"})
+            return
+        self.send_json(404, {'error': f"Unknown path {url.path}"})
+
+    def param(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        values = self.query.get(name)
+        return values[0] if values else default
+
+    def as_of(self) -> Optional[str]:
+        return check_as_of(self.param('as_of'))
+
+    def page_size(self) -> int:
+        try:
+            return int(self.param('page_size', str(DEFAULT_PAGE_SIZE)))
+        except ValueError:
+            raise ValueError(f"page_size must be an integer up to {MAX_PAGE_SIZE}") from None
+
+    def send_json(self, status: int, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(payload)
+        self.close_connection = True
+
+    def start_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.streaming = True
+        self.close_connection = True
+
+    def write_chunk(self, text: str):
+        data = text.encode('utf-8')
+        if data:
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+
+    def end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+
+    def get_employee(self, emp_no: str):
+        as_of = self.as_of()
+        if as_of:
+            rows = self.data.execute_named('employee_details_as_of', (as_of, int(emp_no)))
+        else:
+            rows = self.data.execute_named('employee_details', (int(emp_no),))
+        if not rows:
+            self.send_json(404, {'error': f"Employee {emp_no} not found"})
+            return
+        employee = dict(zip(DETAIL_COLUMNS, rows[0]))
+        employee['is_manager'] = employee['manager_from'] is not None
+        self.send_json(200, employee)
+
+    def get_departments(self):
+        self.send_json(200, self.data.get_all_departments())
+
+    def get_department_employees(self, dept_name: str):
+        as_of = self.as_of()
+        if 'page_size' in self.query or 'page_token' in self.query:
+            if as_of:
+                raise ValueError("as_of listings are not paged; omit page_size and page_token")
+            page = self.data.get_employees_by_department_page(
+                dept_name, self.page_size(), self.param('page_token')
+            )
+            self.send_json(200, page_json(DEPARTMENT_COLUMNS, page))
+            return
+
+        # Constant memory however large the department: one batch at a time
+        if as_of:
+            name, params = 'employees_by_department_as_of', (as_of, dept_name)
+        else:
+            name, params = 'employees_by_department', (dept_name,)
+        with self.data.stream(name, params, self.STREAM_BATCH_SIZE) as stream:
+            self.start_stream()
+            self.write_chunk("[")
+            first = True
+            for batch in stream.batches():
+                items = [json.dumps(record) for record in records(DEPARTMENT_COLUMNS, batch)]
+                self.write_chunk(("" if first else ",") + ",".join(items))
+                first = False
+            self.write_chunk("]")
+            self.end_stream()
+
+    def get_department_stats(self, dept_name: str):
+        as_of = self.as_of()
+        if as_of:
+            rows = self.data.execute_named('department_stats_as_of', (as_of, dept_name))
+        else:
+            rows = self.data.execute_named('department_stats', (dept_name,))
+        self.send_json(200, dict(zip(STATS_COLUMNS, rows[0])) if rows else {})
+
+    def get_search(self):
+        term = self.param('q', '').strip()
+        if not term:
+            raise ValueError("Missing search term q")
+        page = self.data.search_employees_page(term, self.page_size(), self.param('page_token'))
+        self.send_json(200, page_json(SEARCH_COLUMNS, page))
+
+    def get_analytics(self):
+        as_of = self.as_of()
+        overview = self.data.analytics.overview(as_of)
+        breakdown = self.data.analytics.department_breakdown(as_of)
+        self.send_json(200, {
+            'overview': overview._asdict(),
+            'departments': [dept._asdict() for dept in breakdown],
+        })
+
+    def get_query_stats(self):
+        if self.data.log is None:
+            self.send_json(404, {'error': "Query log is disabled"})
+            return
+        try:
+            limit = int(self.param('limit', '20'))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        self.send_json(200, {
+            'top': self.data.log.top(limit),
+            'recent_slow': list(self.data.log.recent_slow),
+        })
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that handles requests on a fixed pool of worker threads
+
+    Each worker keeps one read-only connection (EmployeeData's connections
+    are per thread). At most max_workers requests run at once and up to
+    max_pending more wait for a worker; beyond that requests get an
+    immediate 503 instead of piling up.
+    """
+
+    def __init__(self, address: Tuple[str, int], data: EmployeeData,
+                 max_workers: int = 4, max_pending: int = 64):
+        super().__init__(address, ApiHandler)
+        self.data = data
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self._reject(request)
+            return
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def _reject(self, request):
+        body = json.dumps({'error': "Server busy, retry later"}).encode('utf-8')
+        try:
+            request.sendall(
+                b"HTTP/1.1 503 Service Unavailable\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Retry-After: 1\r\n"
+                b"Connection: close\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode('ascii') + body
+            )
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+        self.data.close()
+
+
+def create_server(db_file: str, port: int = DEFAULT_PORT, max_workers: int = 4,
+                  max_pending: int = 64) -> PooledHTTPServer:
+    """Build a server on localhost over a read-only view of db_file"""
+    data = EmployeeData(DatabaseConfig(
+        db_file, read_only=True, mmap_size=DEFAULT_MMAP_SIZE, temp_store='MEMORY'
+    ))
+    data.detect_features()
+    return PooledHTTPServer((HOST, port), data, max_workers=max_workers, max_pending=max_pending)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the employee queries as JSON on localhost")
+    parser.add_argument('database', nargs='?', help="database file (default: employees_db*.db beside this script)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=4, help="worker threads (one connection each)")
+    parser.add_argument('--max-pending', type=int, default=64, help="queued requests before answering 503")
+    parser.add_argument('--log-slow-queries', action='store_true', help="print slow queries with their plans to stderr")
+    args = parser.parse_args(argv)
+    if args.log_slow_queries:
+        log_slow_queries()
+
+    # Connections are read-only, so apply migrations (db_migrations.py) beforehand
+    server = create_server(database_argument(args.database), args.port, args.workers, args.max_pending)
+    print(f"Serving on http://{HOST}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from db_connection import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+
+class LatestOnlyWorker:
+    """Run database jobs on one background thread, keeping only the newest
+
+    Submitting a job supersedes any job that has not started yet and
+    interrupts the one currently running, so a burst of submissions (e.g.
+    keystrokes) never queues up stale scans. Results are handed back on the
+    Tk thread through root.after polling, and only for the newest job.
+    """
+
+    POLL_MS = 30
+
+    def __init__(self, root, db: ConnectionManager, name: str = "db-worker"):
+        self.root = root
+        self.db = db
+        self._cond = threading.Condition()
+        self._pending = None
+        self._generation = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._results: "queue.Queue" = queue.Queue()
+        self._polling = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._work, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Callable[[], Any], on_result: Callable[[Any], None],
+               on_error: Optional[Callable[[Exception], None]] = None):
+        """Schedule job(); on_result/on_error run on the Tk thread if it is still the newest"""
+        with self._cond:
+            self._generation += 1
+            self._pending = (self._generation, job, on_result, on_error)
+            if self._conn is not None:
+                # Abort whatever the worker is running right now
+                self._conn.interrupt()
+            self._cond.notify()
+        self._start_polling()
+
+    def cancel(self):
+        """Drop the pending job and interrupt the running one"""
+        with self._cond:
+            self._generation += 1
+            self._pending = None
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def stop(self):
+        """Stop the worker thread after its current job"""
+        with self._cond:
+            self._stopped = True
+            self._pending = None
+            self._cond.notify()
+
+    def _is_current(self, generation: int) -> bool:
+        with self._cond:
+            return generation == self._generation
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                generation, job, on_result, on_error = self._pending
+                self._pending = None
+                self._conn = self.db.connection()
+            try:
+                outcome = self._run(generation, job)
+                if outcome is not None:
+                    self._results.put((generation, on_result, on_error) + outcome)
+            finally:
+                with self._cond:
+                    self._conn = None
+
+    def _run(self, generation: int, job: Callable[[], Any]):
+        """Run job, returning (result, error) or None if it was superseded"""
+        while True:
+            try:
+                return job(), None
+            except sqlite3.OperationalError as e:
+                if 'interrupted' not in str(e):
+                    return None, e
+                # An interrupt aimed at the previous job can also hit this one
+                if not self._is_current(generation):
+                    return None
+            except Exception as e:
+                return None, e
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    generation, on_result, on_error, result, error = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if not self._is_current(generation):
+                    continue
+                # A failing callback must not stop delivery of later results
+                try:
+                    if error is None:
+                        on_result(result)
+                    elif on_error is not None:
+                        on_error(error)
+                except Exception:
+                    logger.exception("Background job callback failed")
+        finally:
+            with self._cond:
+                idle = self._pending is None and self._conn is None
+            if idle and self._results.empty():
+                self._polling = False
+            else:
+                self.root.after(self.POLL_MS, self._poll)
+
+
+class QueryExecutor:
+    """Thread pool for database work with callbacks delivered on the Tk thread
+
+    Jobs run on pool threads (each gets its own connection from the
+    ConnectionManager on first use) and return futures. Completion, error
+    and progress notifications are queued and drained by root.after
+    polling, so callbacks may touch widgets safely.
+    """
+
+    POLL_MS = 30
+
+    def __init__(self, root, max_workers: int = 4,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        self.root = root
+        self.on_error = on_error
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query")
+        self._events: "queue.Queue" = queue.Queue()
+        self._outstanding = 0
+        self._polling = False
+
+    def submit(self, fn: Callable[..., Any], *args,
+               on_result: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None,
+               on_progress: Optional[Callable[[Any], None]] = None) -> Future:
+        """Run fn(*args) on the pool; fn gets a progress= callable when on_progress is given"""
+        kwargs = {}
+        if on_progress is not None:
+            kwargs['progress'] = lambda value: self._events.put((on_progress, value))
+
+        future = self._pool.submit(fn, *args, **kwargs)
+        self._outstanding += 1
+        future.add_done_callback(
+            lambda f: self._events.put((self._finish, (f, on_result, on_error)))
+        )
+        self._start_polling()
+        return future
+
+    def shutdown(self):
+        """Stop accepting work and drop jobs that have not started"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, args):
+        future, on_result, on_error = args
+        self._outstanding -= 1
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            if on_result is not None:
+                on_result(future.result())
+            return
+        handler = on_error or self.on_error
+        if handler is not None:
+            handler(error)
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, value = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                # A failing callback must not stop delivery of later events
+                try:
+                    callback(value)
+                except Exception:
+                    logger.exception("Query callback failed")
+        finally:
+            if self._outstanding or not self._events.empty():
+                self.root.after(self.POLL_MS, self._poll)
+            else:
+                self._polling = False
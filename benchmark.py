@@ -0,0 +1,255 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, NamedTuple, Optional
+
+from datagen import generate
+from db_migrations import apply_migrations
+from db_connection import DEFAULT_MMAP_SIZE
+from employee_data import DatabaseConfig, EmployeeData
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_ITERATIONS = 50
+WARMUP_ITERATIONS = 3
+# A p95 this much slower than the baseline, and at least MIN_REGRESSION_MS
+# slower, counts as a regression; sub-millisecond timings jitter by more
+# than 20% from run to run
+REGRESSION_THRESHOLD = 1.2
+MIN_REGRESSION_MS = 1.0
+# With fewer timings the p95 is little more than the maximum
+MIN_COMPARE_ITERATIONS = 20
+
+
+class Operation(NamedTuple):
+    """One benchmarked call; setup draws the arguments for each iteration"""
+    name: str
+    run: Callable[[EmployeeData, tuple], object]
+    setup: Callable[[random.Random, 'Dataset'], tuple]
+
+
+class Dataset(NamedTuple):
+    size: int
+    path: str
+    emp_nos: List[int]
+    departments: List[str]
+    name_fragments: List[str]
+
+
+def historical_date(rng: random.Random) -> str:
+    """A random as-of date inside the generated history"""
+    day = datetime.date(1986, 1, 1) + datetime.timedelta(days=rng.randrange(16 * 365))
+    return day.isoformat()
+
+
+OPERATIONS = [
+    Operation('get_employee_details', lambda data, args: data.get_employee_details(*args),
+              lambda rng, ds: (rng.choice(ds.emp_nos),)),
+    Operation('load_session', lambda data, args: data.load_session(*args),
+              lambda rng, ds: (rng.choice(ds.emp_nos),)),
+    Operation('get_employees_by_department', lambda data, args: data.get_employees_by_department(*args),
+              lambda rng, ds: (rng.choice(ds.departments),)),
+    Operation('get_employees_by_department_page',
+              lambda data, args: data.get_employees_by_department_page(*args),
+              lambda rng, ds: (rng.choice(ds.departments),)),
+    Operation('search_employees', lambda data, args: data.search_employees(*args),
+              lambda rng, ds: (rng.choice(ds.name_fragments),)),
+    Operation('get_department_stats', lambda data, args: data.get_department_stats(*args),
+              lambda rng, ds: (rng.choice(ds.departments),)),
+    Operation('analytics_page', lambda data, args: (data.analytics.overview(),
+                                                    data.analytics.department_breakdown()),
+              lambda rng, ds: ()),
+    Operation('get_employees_by_department_as_of', lambda data, args: data.get_employees_by_department(*args),
+              lambda rng, ds: (rng.choice(ds.departments), historical_date(rng))),
+    Operation('analytics_page_as_of', lambda data, args: (data.analytics.overview(*args),
+                                                          data.analytics.department_breakdown(*args)),
+              lambda rng, ds: (historical_date(rng),)),
+]
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def prepare_dataset(size: int, data_dir: str, seed: int) -> Dataset:
+    """Generate (or reuse) a migrated database with `size` employees"""
+    path = os.path.join(data_dir, f"employees-{size}-seed{seed}.db")
+    if not os.path.exists(path):
+        print(f"Generating {size:,} employees into {path}", file=sys.stderr)
+        partial = path + '.tmp'
+        if os.path.exists(partial):
+            # Left over from an interrupted run
+            os.remove(partial)
+        generate(partial, size, seed)
+        conn = sqlite3.connect(partial)
+        try:
+            apply_migrations(conn)
+        finally:
+            conn.close()
+        os.replace(partial, path)
+
+    conn = sqlite3.connect(path)
+    try:
+        emp_nos = [row[0] for row in conn.execute("SELECT emp_no FROM employees")]
+        departments = [row[0] for row in conn.execute("SELECT dept_name FROM departments")]
+        names = [row[0] for row in conn.execute(
+            "SELECT first_name FROM employees ORDER BY emp_no LIMIT 200")]
+    finally:
+        conn.close()
+    # Three-letter fragments, the shortest a live search sends to the name index
+    fragments = sorted({name[:3].lower() for name in names})
+    return Dataset(size, path, emp_nos, departments, fragments)
+
+
+def measure(data: EmployeeData, operation: Operation, dataset: Dataset,
+            iterations: int, seed: int) -> dict:
+    """Time `iterations` calls, then one more under tracemalloc for its peak allocation"""
+    rng = random.Random(seed)
+    for _ in range(WARMUP_ITERATIONS):
+        operation.run(data, operation.setup(rng, dataset))
+
+    timings = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        args = operation.setup(rng, dataset)
+        # Login profiles are cached; measure the query, not the cache
+        data.sessions.clear()
+        start = time.perf_counter()
+        operation.run(data, args)
+        timings.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        operation.run(data, operation.setup(rng, dataset))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'dataset': dataset.size,
+        'operation': operation.name,
+        'iterations': iterations,
+        'p50_ms': percentile(timings, 0.50) * 1000,
+        'p95_ms': percentile(timings, 0.95) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'max_ms': timings[-1] * 1000,
+        'throughput_per_s': iterations / elapsed if elapsed else None,
+        'peak_alloc_kb': peak / 1024,
+    }
+
+
+def run_benchmarks(sizes, data_dir: str, iterations: int = DEFAULT_ITERATIONS, seed: int = 1,
+                   operations: Optional[List[str]] = None, result_cache: bool = False,
+                   columnar: bool = False) -> dict:
+    """Benchmark every operation on every dataset size"""
+    selected = [op for op in OPERATIONS if not operations or op.name in operations]
+    results = []
+    for size in sizes:
+        dataset = prepare_dataset(size, data_dir, seed)
+        data = EmployeeData(DatabaseConfig(
+            dataset.path, read_only=True, mmap_size=DEFAULT_MMAP_SIZE, temp_store='MEMORY',
+            result_cache_entries=256 if result_cache else 0, columnar=columnar
+        ))
+        data.detect_features()
+        try:
+            for operation in selected:
+                result = measure(data, operation, dataset, iterations, seed)
+                results.append(result)
+                print(f"{size:>9,}  {operation.name:<34}p50 {result['p50_ms']:>9.2f} ms  "
+                      f"p95 {result['p95_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  "
+                      f"{result['throughput_per_s']:>9.1f}/s  {result['peak_alloc_kb']:>9.0f} KB",
+                      file=sys.stderr)
+        finally:
+            data.close()
+
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': seed,
+        'iterations': iterations,
+        'result_cache': result_cache,
+        'columnar': columnar,
+        # ru_maxrss is in KB on Linux
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD,
+            min_ms: float = MIN_REGRESSION_MS) -> List[str]:
+    """Describe every operation whose p95 got slower than threshold x baseline and by min_ms
+
+    Operations timed fewer than MIN_COMPARE_ITERATIONS times in either run
+    are not compared.
+    """
+    before = {(r['dataset'], r['operation']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = before.get((result['dataset'], result['operation']))
+        if not old or not old['p95_ms']:
+            continue
+        if min(old['iterations'], result['iterations']) < MIN_COMPARE_ITERATIONS:
+            continue
+        if (result['p95_ms'] > old['p95_ms'] * threshold
+                and result['p95_ms'] - old['p95_ms'] >= min_ms):
+            regressions.append(
+                f"{result['operation']} @ {result['dataset']:,}: p95 {old['p95_ms']:.2f} ms "
+                f"-> {result['p95_ms']:.2f} ms ({result['p95_ms'] / old['p95_ms']:.2f}x)"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the data-access methods on generated datasets")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="employee counts of the generated datasets")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--operations', nargs='+', choices=[op.name for op in OPERATIONS])
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'employee-bench'),
+                        help="where generated datasets are kept between runs")
+    parser.add_argument('--result-cache', action='store_true', help="leave the result cache on")
+    parser.add_argument('--columnar', action='store_true',
+                        help="answer current department statistics from the columnar snapshot")
+    parser.add_argument('--output', help="JSON results file (default: benchmark-<timestamp>.json)")
+    parser.add_argument('--compare', help="baseline JSON; exit 1 if any p95 regressed")
+    parser.add_argument('--regression-ms', type=float, default=MIN_REGRESSION_MS,
+                        help="smallest p95 increase that counts as a regression")
+    args = parser.parse_args(argv)
+    if args.compare and args.iterations < MIN_COMPARE_ITERATIONS:
+        parser.error(f"--compare needs at least {MIN_COMPARE_ITERATIONS} iterations")
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = run_benchmarks(args.sizes, args.data_dir, args.iterations, args.seed,
+                            args.operations, args.result_cache, args.columnar)
+
+    output = args.output or f"benchmark-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), report, min_ms=args.regression_ms)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
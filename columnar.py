@@ -0,0 +1,350 @@
+import argparse
+import datetime
+import sqlite3
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from analytics import DepartmentSummary
+from db_migrations import database_argument
+from quantile_sketch import nearest_rank
+from query_registry import check_as_of
+from result_cache import file_change_counter
+import current_state
+
+# Code 0 of every dictionary-encoded column stands for "none" (no current
+# title, department, ...)
+MISSING = None
+
+# The columns a snapshot holds, one row per employee, oldest hire first
+_FROM_CURRENT_EMPLOYEE = """
+    SELECT emp_no, gender, hire_date, title, salary, dept_name, is_manager
+    FROM current_employee
+    ORDER BY hire_date, emp_no
+"""
+
+_FROM_HISTORY = """
+    SELECT
+        e.emp_no, e.gender, e.hire_date,
+        (SELECT t.title FROM titles t
+         WHERE t.emp_no = e.emp_no AND t.to_date = '9999-01-01' LIMIT 1),
+        (SELECT s.salary FROM salaries s
+         WHERE s.emp_no = e.emp_no AND s.to_date = '9999-01-01' LIMIT 1),
+        (SELECT d.dept_name FROM dept_emp de JOIN departments d ON d.dept_no = de.dept_no
+         WHERE de.emp_no = e.emp_no AND de.to_date = '9999-01-01' LIMIT 1),
+        EXISTS (SELECT 1 FROM dept_manager dm
+                WHERE dm.emp_no = e.emp_no AND dm.to_date = '9999-01-01')
+    FROM employees e
+    ORDER BY e.hire_date, e.emp_no
+"""
+
+ENCODED_COLUMNS = ('dept', 'title', 'gender')
+
+
+class SliceStats(NamedTuple):
+    """Headcount and salary figures for any selection of employees"""
+    total_employees: int
+    avg_salary: Optional[float]
+    max_salary: Optional[int]
+    min_salary: Optional[int]
+    managers_count: int
+
+
+def _bitset(column: bytes, wanted: Callable[[int], bool]) -> int:
+    """Bitset (bit i = row i) of the rows whose byte in column satisfies wanted
+
+    bytes.translate turns the column into ASCII '0'/'1' and int() parses the
+    reversed string in base 2, so no Python code runs per row.
+    """
+    if not column:
+        return 0
+    table = bytes(ord('1') if wanted(value) else ord('0') for value in range(256))
+    return int(column.translate(table)[::-1], 2)
+
+
+def _byte_planes(values: array) -> List[bytes]:
+    """Byte k of every value, least significant first, one bytes object per k"""
+    raw = memoryview(values).cast('B')
+    size = values.itemsize
+    order = range(size) if sys.byteorder == 'little' else reversed(range(size))
+    return [bytes(raw[k::size]) for k in order]
+
+
+class _Dictionary:
+    """Codes for the distinct values of one column; code 0 is MISSING"""
+
+    def __init__(self, values: Iterable = ()):
+        self.values: List = [MISSING]
+        self.codes: Dict = {MISSING: 0}
+        for value in values:
+            self.code(value)
+
+    def code(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ColumnarSnapshot:
+    """Current employees held column by column in compact typed arrays
+
+    Department, title and gender are dictionary-encoded (one byte per row
+    up to 255 distinct values), hire dates are stored as proleptic ordinals
+    and rows are kept in hire date order, so a hire-date range is a
+    contiguous run of rows. The snapshot is a copy taken at load time.
+
+    Selections are bitsets held in Python ints (bit i = row i), so filters
+    combine with & and | and counting is int.bit_count(). Salaries are also
+    kept bit-sliced: one bitset per salary bit. Sums, minimums, maximums,
+    percentiles and range counts of a selection then take one bitset
+    operation per salary bit, whatever the number of rows, and nothing is
+    sorted.
+    """
+
+    def __init__(self, emp_no: array, salary: array, hire_day: array, manager: array,
+                 encoded: Dict[str, array], dictionaries: Dict[str, _Dictionary],
+                 change_counter: Optional[int] = None):
+        self.emp_no = emp_no
+        # 0 where the employee has no current salary; salaries are never negative
+        self.salary = salary
+        self.hire_day = hire_day
+        self.manager = manager
+        self.encoded = encoded
+        self.dictionaries = dictionaries
+        self.change_counter = change_counter
+        self.all = (1 << len(emp_no)) - 1
+
+        self._managers = _bitset(manager.tobytes(), bool)
+        self._bitmaps: Dict[tuple, int] = {}
+        planes = _byte_planes(salary)
+        self._paid = 0
+        for plane in planes:
+            self._paid |= _bitset(plane, bool)
+        top = max(salary, default=0).bit_length()
+        self._salary_bits = [_bitset(planes[bit // 8], lambda value, shift=bit % 8: value >> shift & 1)
+                             for bit in range(top)]
+        # Complements too: & with a negative int is several times slower
+        self._salary_zeros = [self.all & ~bitset for bitset in self._salary_bits]
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, db_file: Optional[str] = None) -> 'ColumnarSnapshot':
+        """Read every current employee, from current_employee when it is enabled
+
+        With db_file, the database header's change counter is kept so that
+        callers can tell when the snapshot has gone stale.
+        """
+        change_counter = file_change_counter(db_file) if db_file else None
+        sql = _FROM_CURRENT_EMPLOYEE if current_state.is_enabled(conn) else _FROM_HISTORY
+        dictionaries = {
+            'dept': _Dictionary(row[0] for row in conn.execute(
+                "SELECT dept_name FROM departments ORDER BY dept_name")),
+            'title': _Dictionary(),
+            'gender': _Dictionary(),
+        }
+        emp_nos, salaries, hire_days, managers = array('i'), array('i'), array('i'), array('B')
+        codes = {column: [] for column in ENCODED_COLUMNS}
+        # Many employees share a hire date; convert each date once
+        ordinals: Dict[str, int] = {}
+        dept_code, title_code, gender_code = (dictionaries[column].code for column in ENCODED_COLUMNS)
+
+        for emp_no, gender, hire_date, title, salary, dept_name, is_manager in conn.execute(sql):
+            day = ordinals.get(hire_date)
+            if day is None:
+                day = ordinals[hire_date] = datetime.date.fromisoformat(hire_date).toordinal()
+            emp_nos.append(emp_no)
+            salaries.append(max(salary or 0, 0))
+            hire_days.append(day)
+            managers.append(1 if is_manager else 0)
+            codes['dept'].append(dept_code(dept_name))
+            codes['title'].append(title_code(title))
+            codes['gender'].append(gender_code(gender))
+
+        encoded = {}
+        for column, values in codes.items():
+            encoded[column] = array('B' if len(dictionaries[column].values) <= 256 else 'H', values)
+        return cls(emp_nos, salaries, hire_days, managers, encoded, dictionaries, change_counter)
+
+    def __len__(self) -> int:
+        return len(self.emp_no)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns and bitsets (dictionaries excluded)"""
+        arrays = [self.emp_no, self.salary, self.hire_day, self.manager] + list(self.encoded.values())
+        bitsets = self._salary_bits + self._salary_zeros + list(self._bitmaps.values()) + [self._paid, self._managers]
+        return (sum(column.itemsize * len(column) for column in arrays)
+                + sum((bitset.bit_length() + 7) // 8 for bitset in bitsets))
+
+    def values(self, column: str) -> List:
+        """The distinct values of an encoded column, MISSING first"""
+        return list(self.dictionaries[column].values)
+
+    def equals(self, column: str, value) -> int:
+        """Rows whose encoded column holds value (a bitmap index, built on first use)"""
+        code = self.dictionaries[column].codes.get(value)
+        if code is None:
+            return 0
+        bitmap = self._bitmaps.get((column, code))
+        if bitmap is None:
+            codes = self.encoded[column]
+            if codes.typecode == 'B':
+                bitmap = _bitset(codes.tobytes(), lambda value: value == code)
+            else:
+                bitmap = _bitset(bytes(1 if value == code else 0 for value in codes), bool)
+            self._bitmaps[(column, code)] = bitmap
+        return bitmap
+
+    def hired_between(self, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        """Rows hired on or after start and before end (YYYY-MM-DD)"""
+        start, end = check_as_of(start), check_as_of(end)
+        low = bisect_left(self.hire_day, datetime.date.fromisoformat(start).toordinal()) if start else 0
+        high = bisect_left(self.hire_day, datetime.date.fromisoformat(end).toordinal()) if end else len(self)
+        return (1 << high) - (1 << low) if high > low else 0
+
+    def select(self, dept: Optional[str] = None, title: Optional[str] = None,
+               gender: Optional[str] = None, hired_from: Optional[str] = None,
+               hired_before: Optional[str] = None, managers_only: bool = False) -> int:
+        """Rows matching every given criterion"""
+        rows = self.all
+        for column, value in (('dept', dept), ('title', title), ('gender', gender)):
+            if value is not None:
+                rows &= self.equals(column, value)
+        if hired_from or hired_before:
+            rows &= self.hired_between(hired_from, hired_before)
+        if managers_only:
+            rows &= self._managers
+        return rows
+
+    def salary_sum(self, rows: int) -> int:
+        """Total salary of the selected rows"""
+        return sum((bitset & rows).bit_count() << bit for bit, bitset in enumerate(self._salary_bits))
+
+    def salary_at_rank(self, rows: int, rank: int) -> int:
+        """The rank-th smallest salary (0-based) among the paid selected rows"""
+        rows &= self._paid
+        value = 0
+        for bit in reversed(range(len(self._salary_bits))):
+            zeros = rows & self._salary_zeros[bit]
+            count = zeros.bit_count()
+            if rank < count:
+                rows = zeros
+            else:
+                rank -= count
+                rows &= self._salary_bits[bit]
+                value |= 1 << bit
+        return value
+
+    def salary_extreme(self, rows: int, highest: bool) -> Optional[int]:
+        """Largest (or smallest) salary among the paid selected rows; needs no counting"""
+        rows &= self._paid
+        if not rows:
+            return None
+        preferred = self._salary_bits if highest else self._salary_zeros
+        value = 0
+        for bit in reversed(range(len(preferred))):
+            narrowed = rows & preferred[bit]
+            if narrowed:
+                rows = narrowed
+            if bool(narrowed) == highest:
+                value |= 1 << bit
+        return value
+
+    def count_below(self, rows: int, limit: int) -> int:
+        """How many paid selected rows earn less than limit"""
+        rows &= self._paid
+        if limit.bit_length() > len(self._salary_bits):
+            return rows.bit_count()
+        below = 0
+        for bit in reversed(range(len(self._salary_bits))):
+            if limit >> bit & 1:
+                below |= rows & self._salary_zeros[bit]
+                rows &= self._salary_bits[bit]
+            else:
+                rows &= self._salary_zeros[bit]
+        return below.bit_count()
+
+    def stats(self, rows: Optional[int] = None) -> SliceStats:
+        """get_department_stats-style figures for the selected rows"""
+        rows = self.all if rows is None else rows
+        paid = rows & self._paid
+        count = paid.bit_count()
+        if not count:
+            return SliceStats(rows.bit_count(), None, None, None, (rows & self._managers).bit_count())
+        return SliceStats(
+            rows.bit_count(),
+            self.salary_sum(paid) / count,
+            self.salary_extreme(paid, highest=True),
+            self.salary_extreme(paid, highest=False),
+            (rows & self._managers).bit_count(),
+        )
+
+    def group_by(self, column: str, rows: Optional[int] = None) -> Dict:
+        """SliceStats for every value of an encoded column within the selection"""
+        rows = self.all if rows is None else rows
+        return {value: self.stats(rows & self.equals(column, value))
+                for value in self.dictionaries[column].values}
+
+    def percentiles(self, fractions: Sequence[float], rows: Optional[int] = None) -> List[Optional[int]]:
+        """Exact nearest-rank salary percentiles of the selected rows"""
+        paid = (self.all if rows is None else rows) & self._paid
+        count = paid.bit_count()
+        if not count:
+            return [None] * len(fractions)
+        return [self.salary_at_rank(paid, nearest_rank(count, fraction)) for fraction in fractions]
+
+    def department_breakdown(self) -> List[DepartmentSummary]:
+        """Same rows as AnalyticsEngine.department_breakdown(), from memory"""
+        groups = self.group_by('dept')
+        return [DepartmentSummary(dept_name, *groups[dept_name])
+                for dept_name in sorted(value for value in groups if value is not MISSING)]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Department statistics for any slice from a columnar snapshot")
+    parser.add_argument('database', nargs='?', help="database file (default: employees_db*.db beside this script)")
+    parser.add_argument('--department')
+    parser.add_argument('--title')
+    parser.add_argument('--gender', choices=('M', 'F'))
+    parser.add_argument('--hired-from', help="YYYY-MM-DD, inclusive")
+    parser.add_argument('--hired-before', help="YYYY-MM-DD, exclusive")
+    parser.add_argument('--managers', action='store_true', help="managers only")
+    parser.add_argument('--group-by', choices=ENCODED_COLUMNS, default='dept')
+    args = parser.parse_args(argv)
+
+    db_file = database_argument(args.database)
+    conn = sqlite3.connect(db_file)
+    try:
+        start = time.perf_counter()
+        snapshot = ColumnarSnapshot.load(conn, db_file)
+        loaded = time.perf_counter() - start
+    finally:
+        conn.close()
+    print(f"Loaded {len(snapshot):,} employees into {snapshot.nbytes / 1024:,.0f} KB in {loaded * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    try:
+        rows = snapshot.select(args.department, args.title, args.gender,
+                               args.hired_from, args.hired_before, args.managers)
+    except ValueError as e:
+        parser.error(str(e))
+    groups = snapshot.group_by(args.group_by, rows)
+    median, p90 = snapshot.percentiles((0.5, 0.9), rows)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.group_by.capitalize():<22}{'Employees':>10}{'Avg':>10}{'Min':>9}{'Max':>9}{'Managers':>10}")
+    for value, stats in groups.items():
+        if not stats.total_employees:
+            continue
+        print(f"{value or '(none)':<22}{stats.total_employees:>10,}"
+              f"{stats.avg_salary or 0:>10,.0f}{stats.min_salary or 0:>9,}"
+              f"{stats.max_salary or 0:>9,}{stats.managers_count:>10,}")
+    print(f"Median salary {median or 0:,}, p90 {p90 or 0:,}; computed in {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import argparse
+import sqlite3
+import sys
+from typing import List
+
+from db_migrations import database_argument
+from query_registry import CURRENT_EMPLOYEE_QUERIES, QUERIES
+
+
+# Current title, salary, department and manager status for one employee,
+# or for everyone when {where} is empty
+_STATE_SELECT = """
+    SELECT
+        e.emp_no, e.first_name, e.last_name, e.gender, e.birth_date, e.hire_date,
+        (SELECT t.title FROM titles t
+         WHERE t.emp_no = e.emp_no AND t.to_date = '9999-01-01' LIMIT 1),
+        (SELECT s.salary FROM salaries s
+         WHERE s.emp_no = e.emp_no AND s.to_date = '9999-01-01' LIMIT 1),
+        d.dept_no, d.dept_name,
+        (SELECT dm.from_date FROM dept_manager dm
+         WHERE dm.emp_no = e.emp_no AND dm.to_date = '9999-01-01' LIMIT 1),
+        EXISTS (SELECT 1 FROM dept_manager dm
+                WHERE dm.emp_no = e.emp_no AND dm.to_date = '9999-01-01')
+    FROM employees e
+    LEFT JOIN departments d ON d.dept_no = (
+        SELECT de.dept_no FROM dept_emp de
+        WHERE de.emp_no = e.emp_no AND de.to_date = '9999-01-01' LIMIT 1
+    )
+    {where}
+"""
+
+_CREATE_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS current_employee (
+        emp_no       INTEGER PRIMARY KEY,
+        first_name   VARCHAR(14) NOT NULL,
+        last_name    VARCHAR(16) NOT NULL,
+        gender       TEXT        NOT NULL,
+        birth_date   DATE        NOT NULL,
+        hire_date    DATE        NOT NULL,
+        title        VARCHAR(50),
+        salary       INT,
+        dept_no      CHAR(4),
+        dept_name    VARCHAR(40),
+        manager_from DATE,
+        is_manager   INTEGER     NOT NULL
+    )
+    """,
+    # Department listing reads rows already in display order
+    """
+    CREATE INDEX IF NOT EXISTS idx_current_employee_dept
+    ON current_employee (dept_name, salary DESC, hire_date)
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_current_employee_dept_no ON current_employee (dept_no)",
+    # Name-ordered keyset pagination of search results
+    "CREATE INDEX IF NOT EXISTS idx_current_employee_name ON current_employee (first_name, last_name)",
+]
+
+# History tables whose current ('9999-01-01') rows feed current_employee
+_HISTORY_TABLES = ('salaries', 'titles', 'dept_emp', 'dept_manager')
+
+
+def _refresh(emp: str) -> str:
+    """Trigger body statements that recompute the row for one employee"""
+    return (
+        f"DELETE FROM current_employee WHERE emp_no = {emp};\n"
+        "INSERT INTO current_employee "
+        + _STATE_SELECT.format(where=f"WHERE e.emp_no = {emp}") + ";\n"
+    )
+
+
+def _trigger_statements() -> List[str]:
+    statements = []
+    for table in _HISTORY_TABLES:
+        # Only rows that are (or were) current can change the materialized state
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_current_employee_{table}_ins
+            AFTER INSERT ON {table} WHEN NEW.to_date = '9999-01-01'
+            BEGIN {_refresh('NEW.emp_no')} END
+        """)
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_current_employee_{table}_del
+            AFTER DELETE ON {table} WHEN OLD.to_date = '9999-01-01'
+            BEGIN {_refresh('OLD.emp_no')} END
+        """)
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_current_employee_{table}_upd
+            AFTER UPDATE ON {table}
+            WHEN OLD.to_date = '9999-01-01' OR NEW.to_date = '9999-01-01'
+            BEGIN {_refresh('OLD.emp_no')} {_refresh('NEW.emp_no')} END
+        """)
+
+    statements.append(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_current_employee_employees_ins
+        AFTER INSERT ON employees
+        BEGIN {_refresh('NEW.emp_no')} END
+    """)
+    statements.append("""
+        CREATE TRIGGER IF NOT EXISTS trg_current_employee_employees_del
+        AFTER DELETE ON employees
+        BEGIN DELETE FROM current_employee WHERE emp_no = OLD.emp_no; END
+    """)
+    statements.append(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_current_employee_employees_upd
+        AFTER UPDATE ON employees
+        BEGIN {_refresh('OLD.emp_no')} {_refresh('NEW.emp_no')} END
+    """)
+    statements.append("""
+        CREATE TRIGGER IF NOT EXISTS trg_current_employee_departments_upd
+        AFTER UPDATE ON departments
+        BEGIN
+            UPDATE current_employee SET dept_no = NEW.dept_no, dept_name = NEW.dept_name
+            WHERE dept_no = OLD.dept_no;
+        END
+    """)
+    return statements
+
+
+def _trigger_names() -> List[str]:
+    names = [f"trg_current_employee_{table}_{event}"
+             for table in _HISTORY_TABLES + ('employees',)
+             for event in ('ins', 'del', 'upd')]
+    return names + ['trg_current_employee_departments_upd']
+
+
+def is_enabled(conn: sqlite3.Connection) -> bool:
+    """Check whether the current_employee table exists"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'current_employee'"
+    ).fetchone()
+    return row is not None
+
+
+def _run_in_transaction(conn: sqlite3.Connection, statements: List[str]):
+    conn.execute("BEGIN")
+    try:
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _rebuild_statements() -> List[str]:
+    return [
+        "DELETE FROM current_employee",
+        "INSERT INTO current_employee " + _STATE_SELECT.format(where=""),
+    ]
+
+
+def enable(conn: sqlite3.Connection):
+    """Create current_employee with its triggers and fill it"""
+    _run_in_transaction(conn, _CREATE_STATEMENTS + _trigger_statements() + _rebuild_statements())
+
+
+def rebuild(conn: sqlite3.Connection):
+    """Recompute every row of current_employee from the history tables"""
+    _run_in_transaction(conn, _rebuild_statements())
+
+
+# Parameterless queries whose current_employee variants must return the same
+# rows as the originals (order aside)
+_CHECKED_QUERIES = ('current_employees', 'current_employee_count', 'current_salaries')
+
+
+def verify(conn: sqlite3.Connection) -> List[str]:
+    """Names of the checked queries whose current_employee variant disagrees with the history joins"""
+    problems = []
+    for name in _CHECKED_QUERIES:
+        original = sorted(conn.execute(QUERIES[name]).fetchall(), key=repr)
+        materialized = sorted(conn.execute(CURRENT_EMPLOYEE_QUERIES[name]).fetchall(), key=repr)
+        if original != materialized:
+            problems.append(f"{name}: {len(original)} rows from the history tables, "
+                            f"{len(materialized)} from current_employee")
+    return problems
+
+
+def disable(conn: sqlite3.Connection):
+    """Drop current_employee and the triggers that maintain it"""
+    statements = [f"DROP TRIGGER IF EXISTS {name}" for name in _trigger_names()]
+    _run_in_transaction(conn, statements + ["DROP TABLE IF EXISTS current_employee"])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the materialized current_employee table")
+    parser.add_argument('command', choices=('enable', 'rebuild', 'verify', 'disable', 'status'))
+    parser.add_argument('database', nargs='?', help="database file (default: employees_db*.db beside this script)")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(database_argument(args.database))
+    try:
+        if args.command == 'enable':
+            enable(conn)
+        elif args.command == 'rebuild':
+            if not is_enabled(conn):
+                print("current_employee is not enabled; run 'enable' first")
+                return 1
+            rebuild(conn)
+        elif args.command == 'verify':
+            if not is_enabled(conn):
+                print("current_employee is not enabled; run 'enable' first")
+                return 1
+            problems = verify(conn)
+            for problem in problems:
+                print(problem)
+            if problems:
+                return 1
+            print("current_employee queries match the history tables")
+        elif args.command == 'disable':
+            disable(conn)
+
+        if is_enabled(conn):
+            count = conn.execute("SELECT COUNT(*) FROM current_employee").fetchone()[0]
+            print(f"current_employee enabled ({count} rows)")
+        else:
+            print("current_employee disabled")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
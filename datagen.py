@@ -0,0 +1,333 @@
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+from db_migrations import apply_migrations
+
+# Same DDL as employees_db-full-1.0.6.db, so generated files are drop-in replacements
+SCHEMA = [
+    """CREATE TABLE employees (
+    emp_no      INT             NOT NULL,
+    birth_date  DATE            NOT NULL,
+    first_name  VARCHAR(14)     NOT NULL,
+    last_name   VARCHAR(16)     NOT NULL,
+    gender      NOT NULL,
+    hire_date   DATE            NOT NULL,
+    PRIMARY KEY (emp_no)
+)""",
+    """CREATE TABLE departments
+(
+    dept_no  CHAR(4) NOT NULL,
+    dept_name   VARCHAR(40) NOT NULL,
+    PRIMARY KEY (dept_no),
+    UNIQUE (dept_name) -- Unique constraint on dept_name
+)""",
+    """CREATE TABLE dept_manager (
+   emp_no       INT             NOT NULL,
+   dept_no      CHAR(4)         NOT NULL,
+   from_date    DATE            NOT NULL,
+   to_date      DATE            NOT NULL,
+   FOREIGN KEY (emp_no)  REFERENCES employees (emp_no)    ON DELETE CASCADE,
+   FOREIGN KEY (dept_no) REFERENCES departments (dept_no) ON DELETE CASCADE,
+   PRIMARY KEY (emp_no,dept_no)
+)""",
+    """CREATE TABLE dept_emp (
+    emp_no      INT             NOT NULL,
+    dept_no     CHAR(4)         NOT NULL,
+    from_date   DATE            NOT NULL,
+    to_date     DATE            NOT NULL,
+    FOREIGN KEY (emp_no)  REFERENCES employees   (emp_no)  ON DELETE CASCADE,
+    FOREIGN KEY (dept_no) REFERENCES departments (dept_no) ON DELETE CASCADE,
+    PRIMARY KEY (emp_no,dept_no)
+)""",
+    """CREATE TABLE titles (
+    emp_no      INT             NOT NULL,
+    title       VARCHAR(50)     NOT NULL,
+    from_date   DATE            NOT NULL,
+    to_date     DATE,
+    FOREIGN KEY (emp_no) REFERENCES employees (emp_no) ON DELETE CASCADE,
+    PRIMARY KEY (emp_no,title, from_date)
+)""",
+    """CREATE TABLE salaries (
+    emp_no      INT             NOT NULL,
+    salary      INT             NOT NULL,
+    from_date   DATE            NOT NULL,
+    to_date     DATE            NOT NULL,
+    FOREIGN KEY (emp_no) REFERENCES employees (emp_no) ON DELETE CASCADE,
+    PRIMARY KEY (emp_no, from_date)
+)""",
+    """CREATE VIEW dept_emp_latest_date AS
+    SELECT emp_no, MAX(from_date) AS from_date, MAX(to_date) AS to_date
+    FROM dept_emp
+    GROUP BY emp_no""",
+    """CREATE VIEW current_dept_emp AS
+    SELECT l.emp_no, d.dept_no, l.from_date, l.to_date
+    FROM dept_emp d
+    INNER JOIN dept_emp_latest_date l
+        ON d.emp_no = l.emp_no
+       AND d.from_date = l.from_date
+       AND d.to_date = l.to_date""",
+]
+
+DEPARTMENTS = [
+    ('d001', 'Marketing'), ('d002', 'Finance'), ('d003', 'Human Resources'),
+    ('d004', 'Production'), ('d005', 'Development'), ('d006', 'Quality Management'),
+    ('d007', 'Sales'), ('d008', 'Research'), ('d009', 'Customer Service'),
+]
+# Relative headcount, roughly that of the original employees sample
+DEPARTMENT_WEIGHTS = [20, 17, 17, 73, 85, 20, 52, 21, 23]
+ENGINEERING_DEPARTMENTS = {'d004', 'd005', 'd006', 'd008'}
+
+# (title, starting salary) from the first rung upwards
+TITLE_LADDERS = {
+    'engineering': [('Assistant Engineer', 39000), ('Engineer', 44000),
+                    ('Senior Engineer', 52000), ('Technique Leader', 58000)],
+    'staff': [('Staff', 40000), ('Senior Staff', 50000)],
+}
+
+CURRENT = '9999-01-01'
+FIRST_HIRE = datetime.date(1985, 1, 1)
+LAST_HIRE = datetime.date(2000, 1, 28)
+# Last day covered by the history; current rows run to the sentinel instead
+CUTOFF = datetime.date(2002, 8, 1)
+
+LEAVE_RATE = 0.1
+TRANSFER_RATE = 0.1
+DEFAULT_EMPLOYEES = 300024
+DEFAULT_BATCH_ROWS = 50000
+
+_SYLLABLES = ['ka', 'ri', 'mo', 'ta', 'el', 'an', 'so', 'be', 'lu', 'na', 'ge', 'or', 'vi', 'de',
+              'sha', 'ko', 'mi', 'ra', 'za', 'pe', 'fa', 'ch', 'ul', 'io', 'ne', 'gu', 'ha', 'ly']
+
+
+def _name_pool(rng: random.Random, size: int, max_length: int) -> List[str]:
+    names = set()
+    while len(names) < size:
+        name = ''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        names.add(name[:max_length].capitalize())
+    return sorted(names)
+
+
+def _add_years(day: datetime.date, years: int) -> datetime.date:
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        # 29 February in a non-leap year
+        return day.replace(year=day.year + years, day=28)
+
+
+def _random_date(rng: random.Random, start: datetime.date, end: datetime.date) -> datetime.date:
+    return datetime.date.fromordinal(rng.randint(start.toordinal(), end.toordinal()))
+
+
+class _Batch:
+    """Rows waiting to be inserted, per table"""
+
+    def __init__(self):
+        self.tables: Dict[str, List[tuple]] = {
+            'employees': [], 'salaries': [], 'titles': [], 'dept_emp': [], 'dept_manager': [],
+        }
+
+    def size(self) -> int:
+        return sum(len(rows) for rows in self.tables.values())
+
+    def flush(self, conn: sqlite3.Connection):
+        """Insert everything in one transaction"""
+        conn.execute("BEGIN")
+        for table, rows in self.tables.items():
+            if rows:
+                marks = ", ".join("?" * len(rows[0]))
+                conn.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+                rows.clear()
+        conn.execute("COMMIT")
+
+
+class Generator:
+    """Deterministic employee history: the same seed and size give the same rows"""
+
+    def __init__(self, seed: int = 1):
+        self.rng = random.Random(seed)
+        self.first_names = _name_pool(self.rng, 1275, 14)
+        self.last_names = _name_pool(self.rng, 1637, 16)
+        # Employees who joined each department, as manager candidates
+        self.members: Dict[str, List[Tuple[int, datetime.date, Optional[datetime.date]]]] = {
+            dept_no: [] for dept_no, _ in DEPARTMENTS
+        }
+
+    def employee(self, emp_no: int, batch: _Batch):
+        """Generate one employee and their salary, title and department history"""
+        rng = self.rng
+        birth = _random_date(rng, datetime.date(1952, 2, 1), datetime.date(1965, 2, 1))
+        hire = _random_date(rng, FIRST_HIRE, LAST_HIRE)
+        batch.tables['employees'].append((
+            emp_no, birth.isoformat(), rng.choice(self.first_names), rng.choice(self.last_names),
+            'M' if rng.random() < 0.6 else 'F', hire.isoformat(),
+        ))
+
+        # Leaving date, or None while still employed
+        end = None
+        earliest_leave = _add_years(hire, 1)
+        if rng.random() < LEAVE_RATE and earliest_leave < CUTOFF:
+            end = _random_date(rng, earliest_leave, CUTOFF)
+        last_day = end or CUTOFF
+
+        dept_no = rng.choices([d for d, _ in DEPARTMENTS], DEPARTMENT_WEIGHTS)[0]
+        self._departments(emp_no, dept_no, hire, end, batch)
+
+        ladder = TITLE_LADDERS['engineering' if dept_no in ENGINEERING_DEPARTMENTS else 'staff']
+        level = rng.randint(0, 1)
+        promotions = []
+        day = hire
+        while level + len(promotions) + 1 < len(ladder):
+            day = _add_years(day, rng.randint(4, 9))
+            if day >= last_day:
+                break
+            promotions.append(day)
+        self._titles(emp_no, ladder, level, hire, promotions, end, batch)
+        self._salaries(emp_no, ladder[level][1], hire, promotions, end, batch)
+
+    def _departments(self, emp_no: int, dept_no: str, hire: datetime.date,
+                     end: Optional[datetime.date], batch: _Batch):
+        rows = batch.tables['dept_emp']
+        last_day = end or CUTOFF
+        earliest_move = _add_years(hire, 1)
+        if self.rng.random() < TRANSFER_RATE and earliest_move < last_day:
+            moved = _random_date(self.rng, earliest_move, last_day)
+            new_dept = self.rng.choice([d for d, _ in DEPARTMENTS if d != dept_no])
+            rows.append((emp_no, dept_no, hire.isoformat(), moved.isoformat()))
+            self.members[dept_no].append((emp_no, hire, moved))
+            dept_no, hire = new_dept, moved
+        rows.append((emp_no, dept_no, hire.isoformat(), end.isoformat() if end else CURRENT))
+        self.members[dept_no].append((emp_no, hire, end))
+
+    def _titles(self, emp_no: int, ladder, level: int, hire: datetime.date,
+                promotions: List[datetime.date], end: Optional[datetime.date], batch: _Batch):
+        starts = [hire] + promotions
+        for index, start in enumerate(starts):
+            stop = starts[index + 1].isoformat() if index + 1 < len(starts) else (
+                end.isoformat() if end else CURRENT)
+            batch.tables['titles'].append((emp_no, ladder[level + index][0], start.isoformat(), stop))
+
+    def _salaries(self, emp_no: int, base: int, hire: datetime.date,
+                  promotions: List[datetime.date], end: Optional[datetime.date], batch: _Batch):
+        rng = self.rng
+        rows = batch.tables['salaries']
+        salary = base + rng.randint(0, 12000)
+        last_day = end or CUTOFF
+        start = hire
+        while True:
+            following = _add_years(start, 1)
+            if following >= last_day:
+                rows.append((emp_no, salary, start.isoformat(), end.isoformat() if end else CURRENT))
+                return
+            rows.append((emp_no, salary, start.isoformat(), following.isoformat()))
+            # Yearly raise, with a bigger step in a promotion year
+            raise_rate = rng.uniform(0.0, 0.05)
+            if any(start < day <= following for day in promotions):
+                raise_rate += rng.uniform(0.08, 0.15)
+            salary = int(salary * (1 + raise_rate))
+            start = following
+
+    def managers(self, batch: _Batch):
+        """Give every department a succession of managers, the last one current"""
+        rng = self.rng
+        for dept_no, _ in DEPARTMENTS:
+            current = [m for m in self.members[dept_no] if m[2] is None]
+            if not current:
+                continue
+            terms = rng.randint(2, 4)
+            changes = sorted(_random_date(rng, datetime.date(1986, 1, 1), datetime.date(2001, 12, 31))
+                             for _ in range(terms - 1))
+            starts = [FIRST_HIRE] + changes
+            chosen = set()
+            for index, start in enumerate(starts):
+                last = index + 1 == len(starts)
+                stop = CURRENT if last else starts[index + 1].isoformat()
+                pool = current if last else self.members[dept_no]
+                # Someone already in the department when the term starts, if possible
+                candidates = [m for m in pool if m[1] <= start and m[0] not in chosen] or \
+                             [m for m in pool if m[0] not in chosen]
+                if not candidates:
+                    continue
+                emp_no = rng.choice(candidates[:1000])[0]
+                chosen.add(emp_no)
+                batch.tables['dept_manager'].append((emp_no, dept_no, start.isoformat(), stop))
+
+
+def generate(path: str, employees: int = DEFAULT_EMPLOYEES, seed: int = 1,
+             batch_rows: int = DEFAULT_BATCH_ROWS,
+             progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """Create a new database at path and return the row count of each table"""
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        # A half-built file is useless anyway, so skip the durability work
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -200000")
+        conn.execute("BEGIN")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.executemany("INSERT INTO departments VALUES (?, ?)", DEPARTMENTS)
+        conn.execute("COMMIT")
+
+        generator = Generator(seed)
+        batch = _Batch()
+        for emp_no in range(10001, 10001 + employees):
+            generator.employee(emp_no, batch)
+            if batch.size() >= batch_rows:
+                batch.flush(conn)
+                if progress:
+                    progress(emp_no - 10000, employees)
+        generator.managers(batch)
+        batch.flush(conn)
+        if progress:
+            progress(employees, employees)
+
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ('employees', 'departments', 'dept_emp', 'dept_manager', 'titles', 'salaries')
+        }
+    finally:
+        conn.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic employees database")
+    parser.add_argument('output', help="new database file")
+    parser.add_argument('--employees', type=int, default=DEFAULT_EMPLOYEES)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help="rows per transaction")
+    parser.add_argument('--force', action='store_true', help="replace an existing output file")
+    parser.add_argument('--migrate', action='store_true', help="apply schema migrations afterwards")
+    args = parser.parse_args(argv)
+
+    if args.force and os.path.exists(args.output):
+        os.remove(args.output)
+
+    def progress(done, total):
+        print(f"\rGenerated {done:,} of {total:,} employees", end='', file=sys.stderr, flush=True)
+
+    counts = generate(args.output, args.employees, args.seed, args.batch_rows, progress)
+    print(file=sys.stderr)
+    for table, count in counts.items():
+        print(f"{table:<14}{count:>12,}")
+
+    if args.migrate:
+        conn = sqlite3.connect(args.output)
+        try:
+            applied = apply_migrations(conn)
+            print(f"Applied migrations: {applied}")
+        finally:
+            conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
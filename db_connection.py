@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import threading
+import urllib.parse
+from typing import List, Optional
+
+
+def find_database(folder: Optional[str] = None) -> Optional[str]:
+    """Return the first employees_db*.db in folder (default: this script's folder)"""
+    folder = folder or os.path.dirname(os.path.abspath(__file__))
+    for file in os.listdir(folder):
+        if file.startswith("employees_db") and file.endswith(".db"):
+            return os.path.join(folder, file)
+    return None
+
+
+# Map up to this much of the file for read-only use; pages then come straight
+# from the OS page cache instead of being copied into SQLite's own cache
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+TEMP_STORE_MODES = ('DEFAULT', 'FILE', 'MEMORY')
+
+
+def read_only_uri(db_file: str, immutable: bool = False) -> str:
+    """SQLite URI that opens db_file read-only (and, if immutable, without any locking)"""
+    uri = "file:" + urllib.parse.quote(os.path.abspath(db_file)) + "?mode=ro"
+    return uri + "&immutable=1" if immutable else uri
+
+
+class ConnectionManager:
+    """Keep one long-lived SQLite connection per thread
+
+    read_only opens with mode=ro. immutable additionally tells SQLite the
+    file cannot change, so it skips file locks and change detection entirely;
+    only use it for files that nobody writes while they are open.
+    """
+
+    def __init__(self, db_file: str, cache_size_kb: int = 64000, cached_statements: int = 256,
+                 read_only: bool = False, immutable: bool = False, mmap_size: int = 0,
+                 temp_store: Optional[str] = None):
+        if temp_store is not None and temp_store.upper() not in TEMP_STORE_MODES:
+            raise ValueError(f"temp_store must be one of {', '.join(TEMP_STORE_MODES)}")
+        self.db_file = db_file
+        self.cache_size_kb = cache_size_kb
+        self.cached_statements = cached_statements
+        self.read_only = read_only or immutable
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self.temp_store = temp_store.upper() if temp_store else None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open and warm up a new connection"""
+        # check_same_thread is off so close_all() can run from the Tk thread
+        if self.read_only:
+            conn = sqlite3.connect(
+                read_only_uri(self.db_file, self.immutable), uri=True, check_same_thread=False,
+                cached_statements=self.cached_statements
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_file, check_same_thread=False,
+                cached_statements=self.cached_statements
+            )
+        conn.execute(f"PRAGMA cache_size = -{self.cache_size_kb}")
+        if self.mmap_size:
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        if self.temp_store:
+            conn.execute(f"PRAGMA temp_store = {self.temp_store}")
+        # Force the schema to be parsed now rather than on the first real query
+        conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with self._lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection manager has been closed")
+                conn = self._connect()
+                self._connections.append(conn)
+            self._local.conn = conn
+        return conn
+
+    def close_all(self):
+        """Close every connection handed out so far"""
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
@@ -0,0 +1,261 @@
+import argparse
+import datetime
+import sqlite3
+import sys
+from typing import List, Optional, Tuple
+
+from db_connection import find_database
+from query_registry import QUERIES, department_key, department_page_params, interval_day
+
+
+# Trigger bodies keeping dept_emp_interval in step with dept_emp
+_INTERVAL_INSERT = f"""
+            INSERT INTO dept_emp_interval (from_day, to_day, dept_lo, dept_hi, emp_lo, emp_hi)
+            VALUES ({interval_day('NEW.from_date')},
+                    MAX({interval_day('NEW.from_date')}, {interval_day('NEW.to_date')}),
+                    {department_key('NEW.dept_no')}, {department_key('NEW.dept_no')},
+                    NEW.emp_no, NEW.emp_no);"""
+
+_INTERVAL_DELETE = f"""
+            DELETE FROM dept_emp_interval WHERE id IN (
+                SELECT id FROM dept_emp_interval
+                WHERE emp_lo <= OLD.emp_no AND emp_hi >= OLD.emp_no
+                  AND dept_lo <= {department_key('OLD.dept_no')}
+                  AND dept_hi >= {department_key('OLD.dept_no')}
+            );"""
+
+# (version, description, statements) in the order they must be applied
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Covering indexes for the '9999-01-01' current-row joins", [
+        # Per-employee lookups: seek straight to the current row instead of walking history
+        "CREATE INDEX IF NOT EXISTS idx_salaries_emp_to ON salaries (emp_no, to_date, salary)",
+        "CREATE INDEX IF NOT EXISTS idx_titles_emp_to ON titles (emp_no, to_date, title)",
+        "CREATE INDEX IF NOT EXISTS idx_dept_emp_emp_to ON dept_emp (emp_no, to_date, dept_no)",
+        "CREATE INDEX IF NOT EXISTS idx_dept_manager_emp_to ON dept_manager (emp_no, to_date, from_date)",
+        # Department listings and company-wide aggregates over current rows
+        "CREATE INDEX IF NOT EXISTS idx_dept_emp_dept_to ON dept_emp (dept_no, to_date, emp_no)",
+        "CREATE INDEX IF NOT EXISTS idx_salaries_to ON salaries (to_date, salary)",
+        "CREATE INDEX IF NOT EXISTS idx_dept_manager_to ON dept_manager (to_date, emp_no)",
+        "ANALYZE",
+    ]),
+    (2, "Trigram FTS5 index over employee names", [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS employee_name_fts USING fts5(
+            first_name, last_name,
+            content='employees', content_rowid='emp_no', tokenize='trigram'
+        )
+        """,
+        "INSERT INTO employee_name_fts (employee_name_fts) VALUES ('rebuild')",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_employee_name_fts_ins AFTER INSERT ON employees BEGIN
+            INSERT INTO employee_name_fts (rowid, first_name, last_name)
+            VALUES (NEW.emp_no, NEW.first_name, NEW.last_name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_employee_name_fts_del AFTER DELETE ON employees BEGIN
+            INSERT INTO employee_name_fts (employee_name_fts, rowid, first_name, last_name)
+            VALUES ('delete', OLD.emp_no, OLD.first_name, OLD.last_name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_employee_name_fts_upd AFTER UPDATE ON employees BEGIN
+            INSERT INTO employee_name_fts (employee_name_fts, rowid, first_name, last_name)
+            VALUES ('delete', OLD.emp_no, OLD.first_name, OLD.last_name);
+            INSERT INTO employee_name_fts (rowid, first_name, last_name)
+            VALUES (NEW.emp_no, NEW.first_name, NEW.last_name);
+        END
+        """,
+    ]),
+    (3, "Name-ordered index for keyset-paginated search", [
+        "CREATE INDEX IF NOT EXISTS idx_employees_name ON employees (first_name, last_name, emp_no)",
+    ]),
+    (4, "R*Tree interval index over dept_emp for as-of-date queries", [
+        # Every coordinate is derived from the row itself, never from a rowid,
+        # which VACUUM may renumber; (emp_no, dept_no) is dept_emp's key
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS dept_emp_interval USING rtree_i32(
+            id, from_day, to_day, dept_lo, dept_hi, emp_lo, emp_hi
+        )
+        """,
+        f"""
+        INSERT INTO dept_emp_interval (from_day, to_day, dept_lo, dept_hi, emp_lo, emp_hi)
+        SELECT from_day, MAX(from_day, to_day), dept_key, dept_key, emp_no, emp_no
+        FROM (SELECT {interval_day('from_date')} AS from_day, {interval_day('to_date')} AS to_day,
+                     {department_key('dept_no')} AS dept_key, emp_no
+              FROM dept_emp)
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_dept_emp_interval_ins AFTER INSERT ON dept_emp BEGIN
+            {_INTERVAL_INSERT}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_dept_emp_interval_del AFTER DELETE ON dept_emp BEGIN
+            {_INTERVAL_DELETE}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_dept_emp_interval_upd AFTER UPDATE ON dept_emp BEGIN
+            {_INTERVAL_DELETE}
+            {_INTERVAL_INSERT}
+        END
+        """,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Named queries whose plans are checked: sample parameters and any tables
+# (or aliases) the query is expected to read in full
+PLAN_CHECKS = {
+    'employee_details': ((10001,), ()),
+    'employees_by_department': (('Development',), ()),
+    'search_by_emp_no': ((10001,), ()),
+    # m is the CTE holding at most 100 FTS matches
+    'search_by_name_fts': (('{first_name last_name} : "geo"',), ('m',)),
+    'department_page': (department_page_params('Development', 60000, '1990-01-01', 10001, 101), ()),
+    'department_stats': (('Development',), ()),
+    # COUNT(*) over the whole table is the point of these two subqueries
+    'analytics_overview': ((), ('employees', 'departments')),
+    'department_breakdown': ((), ()),
+    'current_salaries': ((), ()),
+    'employee_details_as_of': (('1995-06-01', 10001), ()),
+    'employees_by_department_as_of': (('1995-06-01', 'Development'), ()),
+    # member_values holds the department's staff on the date, already found by seeks
+    'department_stats_as_of': (('1995-06-01', 'Development'), ('member_values',)),
+    # staff is the co-routine over the R*Tree search; dept_manager is tiny
+    'analytics_overview_as_of': (('1995-06-01',), ('employees', 'departments', 'dept_manager', 'staff')),
+    # staff holds the R*Tree search result, totals one row per department
+    'department_breakdown_as_of': (('1995-06-01',), ('staff', 'totals')),
+}
+
+# Tables (or their aliases) small enough that a full scan is always fine
+SCAN_ALLOWED = ('CONSTANT', 'd', 'departments')
+
+
+def _ensure_version_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version     INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at  TEXT NOT NULL
+        )
+    """)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Return the highest migration version applied to the database"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    ).fetchone()
+    if not exists:
+        return 0
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def has_interval_index(conn: sqlite3.Connection) -> bool:
+    """Check whether dept_emp_interval (migration 4) exists"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dept_emp_interval'"
+    ).fetchone()
+    return row is not None
+
+
+def apply_migrations(conn: sqlite3.Connection) -> List[int]:
+    """Apply all pending migrations, each in its own transaction"""
+    applied = []
+    _ensure_version_table(conn)
+    version = current_version(conn)
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        conn.execute("BEGIN")
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                (number, description, datetime.datetime.now().isoformat(timespec='seconds'))
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        applied.append(number)
+    return applied
+
+
+def migrate_file(db_file: str) -> List[int]:
+    """Apply pending migrations to db_file through a short-lived read-write connection"""
+    conn = sqlite3.connect(db_file)
+    try:
+        return apply_migrations(conn)
+    finally:
+        conn.close()
+
+
+def explain(conn: sqlite3.Connection, query: str, params: tuple = ()) -> List[str]:
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+
+
+def verify_plans(conn: sqlite3.Connection) -> List[str]:
+    """Check the registered queries use indexes; return a list of problems"""
+    problems = []
+    for name, (params, expected_scans) in PLAN_CHECKS.items():
+        try:
+            plan = explain(conn, QUERIES[name], params)
+        except sqlite3.Error as e:
+            problems.append(f"{name}: {e}")
+            continue
+        for detail in plan:
+            words = detail.split()
+            # "SCAN <table>" walks the whole table (or a whole index); only SEARCH
+            # and virtual table (FTS) index lookups seek
+            if (words[0] == 'SCAN' and words[1] not in SCAN_ALLOWED + expected_scans
+                    and 'VIRTUAL' not in words):
+                problems.append(f"{name}: {detail}")
+    return problems
+
+
+def database_argument(path: Optional[str]) -> str:
+    """Resolve a CLI database argument, defaulting to the bundled database"""
+    path = path or find_database()
+    if not path:
+        raise FileNotFoundError("No employees_db*.db found; pass the database path")
+    return path
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the employee database")
+    parser.add_argument('database', nargs='?', help="database file (default: employees_db*.db beside this script)")
+    parser.add_argument('--verify-only', action='store_true', help="only print query plans, do not migrate")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(database_argument(args.database))
+    try:
+        if not args.verify_only:
+            applied = apply_migrations(conn)
+            print(f"Applied migrations: {applied}" if applied else "Schema already up to date")
+        print(f"Schema version: {current_version(conn)}")
+
+        for name, (params, _) in PLAN_CHECKS.items():
+            print(f"\n{name}:")
+            try:
+                for detail in explain(conn, QUERIES[name], params):
+                    print(f"  {detail}")
+            except sqlite3.Error as e:
+                print(f"  error: {e}")
+
+        problems = verify_plans(conn)
+        for problem in problems:
+            print(f"Plan problem: {problem}")
+        return 1 if problems else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
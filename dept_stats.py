@@ -0,0 +1,205 @@
+import argparse
+import sqlite3
+import sys
+from typing import List
+
+from db_migrations import database_argument
+import current_state
+
+# Summary of current_employee per department. Employees without a salary
+# count towards employees but not towards the salary figures, as in AVG()
+_CREATE_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS dept_stats_current (
+        dept_name    VARCHAR(40) PRIMARY KEY,
+        employees    INTEGER NOT NULL,
+        salary_count INTEGER NOT NULL,
+        salary_sum   INTEGER NOT NULL,
+        min_salary   INT,
+        max_salary   INT,
+        managers     INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+]
+
+_AGGREGATE_SELECT = """
+    SELECT dept_name, COUNT(*), COUNT(salary), COALESCE(SUM(salary), 0),
+           MIN(salary), MAX(salary), SUM(is_manager <> 0)
+    FROM current_employee
+    WHERE dept_name IS NOT NULL
+    GROUP BY dept_name
+"""
+
+_TRIGGER_NAMES = [f"trg_dept_stats_current_{event}" for event in ('ins', 'del', 'upd')]
+
+
+def _add(row: str) -> str:
+    """Trigger body statement that adds one current_employee row to its department"""
+    return f"""
+        INSERT INTO dept_stats_current
+            (dept_name, employees, salary_count, salary_sum, min_salary, max_salary, managers)
+        SELECT {row}.dept_name, 1, {row}.salary IS NOT NULL, COALESCE({row}.salary, 0),
+               {row}.salary, {row}.salary, {row}.is_manager <> 0
+        WHERE {row}.dept_name IS NOT NULL
+        ON CONFLICT (dept_name) DO UPDATE SET
+            employees = employees + 1,
+            salary_count = salary_count + excluded.salary_count,
+            salary_sum = salary_sum + excluded.salary_sum,
+            min_salary = COALESCE(MIN(min_salary, excluded.min_salary), min_salary, excluded.min_salary),
+            max_salary = COALESCE(MAX(max_salary, excluded.max_salary), max_salary, excluded.max_salary),
+            managers = managers + excluded.managers;
+    """
+
+
+def _remove(row: str) -> str:
+    """Trigger body statements that take one current_employee row out of its department
+
+    Counts and sums are decremented; the minimum and maximum are only looked
+    up again (an index seek on idx_current_employee_dept) when the row held
+    one of them.
+    """
+    return f"""
+        UPDATE dept_stats_current SET
+            employees = employees - 1,
+            salary_count = salary_count - ({row}.salary IS NOT NULL),
+            salary_sum = salary_sum - COALESCE({row}.salary, 0),
+            managers = managers - ({row}.is_manager <> 0)
+        WHERE dept_name = {row}.dept_name;
+        UPDATE dept_stats_current SET
+            min_salary = (SELECT MIN(salary) FROM current_employee WHERE dept_name = {row}.dept_name),
+            max_salary = (SELECT MAX(salary) FROM current_employee WHERE dept_name = {row}.dept_name)
+        WHERE dept_name = {row}.dept_name AND {row}.salary IN (min_salary, max_salary);
+        DELETE FROM dept_stats_current WHERE dept_name = {row}.dept_name AND employees = 0;
+    """
+
+
+def _trigger_statements() -> List[str]:
+    # current_employee is itself kept current by triggers on the history
+    # tables, which replace an employee's row (delete, then insert) whenever
+    # one of their salary, title, assignment or manager rows changes
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_dept_stats_current_ins
+        AFTER INSERT ON current_employee
+        BEGIN {_add('NEW')} END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_dept_stats_current_del
+        AFTER DELETE ON current_employee
+        BEGIN {_remove('OLD')} END
+        """,
+        # Department renames update current_employee in place
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_dept_stats_current_upd
+        AFTER UPDATE ON current_employee
+        BEGIN {_remove('OLD')} {_add('NEW')} END
+        """,
+    ]
+
+
+def is_enabled(conn: sqlite3.Connection) -> bool:
+    """Check that dept_stats_current exists and is still maintained
+
+    Disabling current_employee drops the table the triggers hang off, which
+    leaves the summary stale; it then no longer counts as enabled.
+    """
+    names = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE name = 'dept_stats_current' OR name LIKE 'trg_dept_stats_current_%'"
+    )}
+    return names >= {'dept_stats_current', *_TRIGGER_NAMES}
+
+
+def _run_in_transaction(conn: sqlite3.Connection, statements: List[str]):
+    conn.execute("BEGIN")
+    try:
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _rebuild_statements() -> List[str]:
+    return [
+        "DELETE FROM dept_stats_current",
+        "INSERT INTO dept_stats_current " + _AGGREGATE_SELECT,
+    ]
+
+
+def enable(conn: sqlite3.Connection):
+    """Create dept_stats_current with its triggers and fill it (needs current_employee)"""
+    if not current_state.is_enabled(conn):
+        raise sqlite3.OperationalError("current_employee is not enabled; run 'current_state.py enable' first")
+    _run_in_transaction(conn, _CREATE_STATEMENTS + _trigger_statements() + _rebuild_statements())
+
+
+def rebuild(conn: sqlite3.Connection):
+    """Recompute every row of dept_stats_current from current_employee"""
+    _run_in_transaction(conn, _rebuild_statements())
+
+
+def disable(conn: sqlite3.Connection):
+    """Drop dept_stats_current and the triggers that maintain it"""
+    statements = [f"DROP TRIGGER IF EXISTS {name}" for name in _TRIGGER_NAMES]
+    _run_in_transaction(conn, statements + ["DROP TABLE IF EXISTS dept_stats_current"])
+
+
+def verify(conn: sqlite3.Connection) -> List[str]:
+    """Departments whose summary row differs from a fresh aggregate of current_employee"""
+    stored = {row[0]: row for row in conn.execute("SELECT * FROM dept_stats_current")}
+    fresh = {row[0]: row for row in conn.execute(_AGGREGATE_SELECT)}
+    problems = []
+    for dept_name in sorted(set(stored) | set(fresh), key=str):
+        if stored.get(dept_name) != fresh.get(dept_name):
+            problems.append(f"{dept_name}: stored {stored.get(dept_name)}, expected {fresh.get(dept_name)}")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the dept_stats_current summary table")
+    parser.add_argument('command', choices=('enable', 'verify', 'rebuild', 'disable', 'status'))
+    parser.add_argument('database', nargs='?', help="database file (default: employees_db*.db beside this script)")
+    parser.add_argument('--check-only', action='store_true', help="verify: report differences without rebuilding")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(database_argument(args.database))
+    try:
+        if args.command == 'enable':
+            try:
+                enable(conn)
+            except sqlite3.OperationalError as e:
+                print(e)
+                return 1
+        elif args.command in ('verify', 'rebuild'):
+            if not is_enabled(conn):
+                print("dept_stats_current is not enabled; run 'enable' first")
+                return 1
+            if args.command == 'verify':
+                problems = verify(conn)
+                for problem in problems:
+                    print(problem)
+                if not problems:
+                    print("dept_stats_current matches current_employee")
+                elif args.check_only:
+                    return 1
+                else:
+                    rebuild(conn)
+                    print(f"Rebuilt dept_stats_current ({len(problems)} department(s) were off)")
+            else:
+                rebuild(conn)
+        elif args.command == 'disable':
+            disable(conn)
+
+        if is_enabled(conn):
+            count = conn.execute("SELECT COUNT(*) FROM dept_stats_current").fetchone()[0]
+            print(f"dept_stats_current enabled ({count} departments)")
+        else:
+            print("dept_stats_current disabled")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from analytics import AnalyticsEngine
+from columnar import ColumnarSnapshot
+from db_connection import ConnectionManager, find_database
+from db_migrations import LATEST_VERSION, apply_migrations, current_version, has_interval_index
+from pagination import (
+    DEFAULT_PAGE_SIZE, DEPARTMENT_KEY, FIRST_SALARY, SEARCH_KEY, Page,
+    check_page_size, decode_token, make_page,
+)
+from query_log import DEFAULT_SLOW_MS, QueryLog
+from query_registry import (
+    CURRENT_EMPLOYEE_QUERIES, DEPT_STATS_QUERIES, HISTORY_AS_OF_QUERIES, QUERIES, QueryRegistry,
+    check_as_of, department_page_params,
+)
+from result_cache import ResultCache, file_change_counter
+from session import SessionCache
+from streaming import DEFAULT_BATCH_SIZE, RowStream
+import current_state
+import dept_stats
+import name_search
+import timeseries
+
+
+class DatabaseConfig(NamedTuple):
+    """How EmployeeData opens and caches the database"""
+    db_file: str
+    cache_size_kb: int = 64000
+    cached_statements: int = 256
+    # Open every connection with mode=ro (see ConnectionManager for immutable)
+    read_only: bool = False
+    immutable: bool = False
+    # Bytes of the file to memory-map; 0 leaves mmap off
+    mmap_size: int = 0
+    # DEFAULT, FILE or MEMORY for sorts and temporary tables; None keeps SQLite's default
+    temp_store: Optional[str] = None
+    # 0 turns the result cache off
+    result_cache_entries: int = 256
+    result_cache_max_rows: int = 5000
+    # Executions at least this slow are logged with their plan; None logs none
+    slow_query_ms: Optional[float] = DEFAULT_SLOW_MS
+    query_log: bool = True
+    # Monthly series cache file; None keeps one per database in the temporary directory
+    timeseries_cache: Optional[str] = None
+    # Answer current department statistics from an in-memory ColumnarSnapshot
+    columnar: bool = False
+
+
+class EmployeeData:
+    """GUI-free access to the employee database
+
+    Every query method runs on the calling thread's connection and raises
+    sqlite3.Error (ValueError for bad page tokens and dates); callers decide
+    how to report failures. Methods taking as_of answer for that date
+    instead of the current state. Nothing here imports tkinter, so the same object backs
+    the Tk app, batch jobs and servers.
+    """
+
+    def __init__(self, config: DatabaseConfig):
+        self.config = config
+        self.db = ConnectionManager(
+            config.db_file, cache_size_kb=config.cache_size_kb,
+            cached_statements=config.cached_statements, read_only=config.read_only,
+            immutable=config.immutable, mmap_size=config.mmap_size, temp_store=config.temp_store
+        )
+        self.cache = None
+        if config.result_cache_entries:
+            self.cache = ResultCache(
+                config.db_file, max_entries=config.result_cache_entries,
+                max_rows=config.result_cache_max_rows
+            )
+        self.log = QueryLog(config.slow_query_ms) if config.query_log else None
+        self.queries = QueryRegistry(cache=self.cache, log=self.log)
+        self.analytics = AnalyticsEngine(
+            self.db, self.queries, snapshot=self.columnar_snapshot if config.columnar else None
+        )
+        self._snapshot: Optional[ColumnarSnapshot] = None
+        self._snapshot_lock = threading.Lock()
+        self.sessions = SessionCache()
+        self.name_index_ready = False
+        self.interval_index_ready = False
+
+    @classmethod
+    def open(cls, db_file: Optional[str] = None, migrate: bool = True, **options) -> 'EmployeeData':
+        """Open db_file (default: the bundled database) and detect optional features"""
+        db_file = db_file or find_database()
+        if not db_file:
+            raise FileNotFoundError("No employees_db*.db found; pass the database path")
+        data = cls(DatabaseConfig(db_file, **options))
+        if migrate:
+            data.migrate_schema()
+        data.detect_features()
+        return data
+
+    def migrate_schema(self) -> List[int]:
+        """Bring the database schema (indexes) up to the latest version
+
+        Read-only and immutable instances never write to the file, so they
+        apply nothing and return []; check schema_is_current() and run
+        db_migrations.py beforehand instead. Call this before anything else
+        so no connection has a stale schema.
+        """
+        if self.config.read_only or self.config.immutable:
+            return []
+        return apply_migrations(self.db.connection())
+
+    def schema_version(self) -> int:
+        """Highest migration version applied to the database"""
+        return current_version(self.db.connection())
+
+    def schema_is_current(self) -> bool:
+        return self.schema_version() >= LATEST_VERSION
+
+    def detect_features(self):
+        """Use current_employee, dept_stats_current and the name FTS index when they exist
+
+        As-of queries read dept_emp_interval when migration 4 has been
+        applied and fall back to date conditions on dept_emp otherwise.
+        """
+        conn = self.db.connection()
+        try:
+            if current_state.is_enabled(conn):
+                self.queries.override(CURRENT_EMPLOYEE_QUERIES)
+            if dept_stats.is_enabled(conn):
+                self.queries.override(DEPT_STATS_QUERIES)
+        except sqlite3.Error:
+            pass
+        try:
+            self.name_index_ready = name_search.is_available(conn)
+        except sqlite3.Error:
+            self.name_index_ready = False
+        try:
+            self.interval_index_ready = has_interval_index(conn)
+        except sqlite3.Error:
+            self.interval_index_ready = False
+        if self.interval_index_ready:
+            self.queries.override({name: QUERIES[name] for name in HISTORY_AS_OF_QUERIES})
+        else:
+            self.queries.override(HISTORY_AS_OF_QUERIES)
+
+    def close(self):
+        """Close every connection opened so far"""
+        self.db.close_all()
+
+    def execute(self, query: str, params: tuple = ()) -> List[Tuple]:
+        """Run ad-hoc SQL on the calling thread's connection"""
+        conn = self.db.connection()
+
+        def run():
+            start = time.perf_counter()
+            rows = conn.execute(query, params).fetchall()
+            if self.log is not None:
+                self.log.record(conn, query, params, time.perf_counter() - start, len(rows))
+            return rows
+
+        return self.cache.fetch(conn, query, params, run) if self.cache is not None else run()
+
+    def execute_named(self, name: str, params: tuple = ()) -> List[Tuple]:
+        """Execute a registered query on the calling thread's connection"""
+        return self.queries.execute(self.db.connection(), name, params)
+
+    def stream(self, name: str, params: tuple = (), batch_size: int = DEFAULT_BATCH_SIZE) -> RowStream:
+        """Stream a registered query's rows in batches, bypassing the result cache"""
+        return RowStream(self.db.connection(), self.queries.sql(name), params, batch_size, self.log)
+
+    def stream_sql(self, query: str, params: tuple = (), batch_size: int = DEFAULT_BATCH_SIZE) -> RowStream:
+        """Stream ad-hoc SQL on the calling thread's connection"""
+        return RowStream(self.db.connection(), query, params, batch_size, self.log)
+
+    def count(self, name: str, params: tuple = ()) -> int:
+        """Run a registered COUNT(*) query"""
+        return self.execute_named(name, params)[0][0]
+
+    def is_manager(self, emp_no: int) -> bool:
+        """Check if employee is a current manager"""
+        result = self.execute_named('is_manager', (emp_no,))
+        return result[0][0] > 0 if result else False
+
+    def get_employee(self, emp_no: int) -> Optional[Tuple]:
+        """Get employee information"""
+        result = self.execute_named('employee', (emp_no,))
+        return result[0] if result else None
+
+    def get_employee_details(self, emp_no: int, as_of: Optional[str] = None) -> Optional[dict]:
+        """Get comprehensive employee details (None if not yet hired on as_of)"""
+        as_of = check_as_of(as_of)
+        if as_of:
+            result = self.execute_named('employee_details_as_of', (as_of, emp_no))
+        else:
+            result = self.execute_named('employee_details', (emp_no,))
+        if result:
+            row = result[0]
+            return {
+                'emp_no': row[0],
+                'first_name': row[1],
+                'last_name': row[2],
+                'gender': row[3],
+                'birth_date': row[4],
+                'hire_date': row[5],
+                'title': row[6] or 'N/A',
+                'salary': f"${row[7]:,}" if row[7] else 'N/A',
+                'department': row[8] or 'N/A',
+                # manager_from only comes from a dept_manager row valid at the time
+                'is_manager': row[9] is not None
+            }
+        return None
+
+    def load_session(self, emp_no: int) -> Optional[dict]:
+        """Identity, current details and role for a login, in one query (cached)"""
+        conn = self.db.connection()
+        profile = self.sessions.get(conn, emp_no)
+        if profile is None:
+            profile = self.get_employee_details(emp_no)
+            if profile is not None:
+                self.sessions.put(conn, emp_no, profile)
+        return profile
+
+    def get_all_departments(self) -> List[str]:
+        """Get all department names"""
+        return [dept[0] for dept in self.execute_named('all_departments')]
+
+    def get_employees_by_department(self, dept_name: str, as_of: Optional[str] = None) -> List[Tuple]:
+        """Get employees in a specific department"""
+        as_of = check_as_of(as_of)
+        if as_of:
+            return self.execute_named('employees_by_department_as_of', (as_of, dept_name))
+        return self.execute_named('employees_by_department', (dept_name,))
+
+    def department_listing(self, dept_name: str, as_of: Optional[str] = None) -> Tuple[str, str, tuple]:
+        """SELECT (without ORDER BY) and COUNT statements, and their parameters, for paging through a department"""
+        as_of = check_as_of(as_of)
+        if as_of:
+            return (self.queries.sql('department_rows_as_of'), self.queries.sql('department_count_as_of'),
+                    (as_of, dept_name))
+        return self.queries.sql('department_rows'), self.queries.sql('department_count'), (dept_name,)
+
+    def search_employees(self, search_term: str) -> List[Tuple]:
+        """Advanced employee search (raises sqlite3.Error, incl. when interrupted)"""
+        if not search_term.strip():
+            return []
+
+        # Check if search term is numeric (employee number)
+        if search_term.isdigit():
+            return self.execute_named('search_by_emp_no', (int(search_term),))
+
+        # Name search
+        terms = search_term.strip().lower().split()
+        match = name_search.match_expression(terms) if self.name_index_ready else None
+        if match:
+            return self.execute_named('search_by_name_fts', (match,))
+
+        if len(terms) == 1:
+            pattern = f"%{terms[0]}%"
+            return self.execute_named('search_by_name', (pattern, pattern))
+        else:
+            first_pattern = f"%{terms[0]}%"
+            last_pattern = f"%{terms[1]}%"
+            return self.execute_named('search_by_full_name', (first_pattern, last_pattern))
+
+    def get_employees_by_department_page(self, dept_name: str, page_size: int = DEFAULT_PAGE_SIZE,
+                                         page_token: Optional[str] = None) -> Page:
+        """One page of a department listing, continuing from page_token"""
+        check_page_size(page_size)
+        after = decode_token(page_token, 'department', dept_name) if page_token else None
+        rows = self.department_rows_after(dept_name, after, page_size + 1)
+        return make_page(rows, page_size, 'department', dept_name, DEPARTMENT_KEY)
+
+    def department_rows_after(self, dept_name: str, after: Optional[Sequence], limit: int) -> List[Tuple]:
+        """Up to limit rows of a department listing after the sort key (salary, hire_date, emp_no)
+
+        after=None starts at the top. Index seeks with current_employee,
+        otherwise one sort of the department per call (see _department_page).
+        """
+        salary, hire_date, emp_no = after if after is not None else (FIRST_SALARY, '', 0)
+        return self.execute_named(
+            'department_page', department_page_params(dept_name, salary, hire_date, emp_no, limit)
+        )
+
+    def column_names(self, query: str, params: tuple = ()) -> List[str]:
+        """Result column names of ad-hoc SQL, without reading any rows"""
+        cursor = self.db.connection().execute(f"SELECT * FROM ({query}) LIMIT 0", params)
+        return [column[0] for column in cursor.description]
+
+    def search_employees_page(self, search_term: str, page_size: int = DEFAULT_PAGE_SIZE,
+                              page_token: Optional[str] = None) -> Page:
+        """One page of search results in name order, continuing from page_token"""
+        check_page_size(page_size)
+        search_term = search_term.strip()
+        if not search_term:
+            return Page([], None, False)
+        if search_term.isdigit():
+            if page_token:
+                return Page([], None, False)
+            return Page(self.execute_named('search_by_emp_no', (int(search_term),)), None, False)
+
+        if page_token:
+            after = tuple(decode_token(page_token, 'search', search_term))
+        else:
+            after = ('', '', 0)
+        rows = self.execute_named(*self.search_page_query(search_term, after, page_size + 1))
+        return make_page(rows, page_size, 'search', search_term, SEARCH_KEY)
+
+    def search_page_query(self, search_term: str, after: tuple = ('', '', 0),
+                          limit: int = -1) -> Tuple[str, tuple]:
+        """Query name and parameters for matches in name order after the key `after`
+
+        A negative limit returns every remaining match (SQLite's LIMIT -1).
+        """
+        search_term = search_term.strip()
+        if search_term.isdigit():
+            return 'search_by_emp_no', (int(search_term),)
+
+        tail = tuple(after) + (limit,)
+        terms = search_term.lower().split()
+        match = name_search.match_expression(terms) if self.name_index_ready else None
+        if match:
+            return 'search_by_name_fts_page', (match,) + tail
+        if len(terms) == 1:
+            pattern = f"%{terms[0]}%"
+            return 'search_by_name_page', (pattern, pattern) + tail
+        return 'search_by_full_name_page', (f"%{terms[0]}%", f"%{terms[1]}%") + tail
+
+    def monthly_series(self, rebuild: bool = False) -> timeseries.MonthlySeries:
+        """Monthly headcount, hires, departures and payroll per department
+
+        Served from the on-disk cache; only history added since it was
+        written is swept, so this is cheap after the first call.
+        """
+        cache_path = self.config.timeseries_cache or timeseries.default_cache_path(self.config.db_file)
+        return timeseries.monthly_series(self.db.connection(), cache_path, rebuild)
+
+    def columnar_snapshot(self, refresh: bool = False) -> ColumnarSnapshot:
+        """The in-memory columnar copy of the current employees
+
+        Loaded on first use and reloaded once the database file's change
+        counter moves (every commit outside WAL mode) or when refresh is set.
+        """
+        with self._snapshot_lock:
+            snapshot = self._snapshot
+            if (refresh or snapshot is None
+                    or snapshot.change_counter != file_change_counter(self.config.db_file)):
+                snapshot = self._snapshot = ColumnarSnapshot.load(self.db.connection(), self.config.db_file)
+            return snapshot
+
+    def get_department_stats(self, dept_name: str, as_of: Optional[str] = None) -> dict:
+        """Get department statistics"""
+        as_of = check_as_of(as_of)
+        if as_of:
+            result = self.execute_named('department_stats_as_of', (as_of, dept_name))
+        elif self.config.columnar:
+            snapshot = self.columnar_snapshot()
+            result = [snapshot.stats(snapshot.select(dept=dept_name))]
+        else:
+            result = self.execute_named('department_stats', (dept_name,))
+        if result:
+            row = result[0]
+            return {
+                'total_employees': row[0],
+                'avg_salary': f"${row[1]:,.0f}" if row[1] else 'N/A',
+                'max_salary': f"${row[2]:,}" if row[2] else 'N/A',
+                'min_salary': f"${row[3]:,}" if row[3] else 'N/A',
+                'managers_count': row[4]
+            }
+        return {}
@@ -0,0 +1,134 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Callable, Optional
+
+from db_migrations import database_argument
+from employee_data import EmployeeData
+from query_log import log_slow_queries
+from query_registry import check_as_of
+from streaming import RowStream
+
+FORMATS = ('csv', 'ndjson')
+# Rows pulled per fetchmany(); also how often progress is reported
+BATCH_SIZE = 1000
+
+Progress = Callable[[int, Optional[int]], None]
+
+
+def format_for(path: str, fmt: Optional[str] = None) -> str:
+    """Explicit format, else guessed from the file extension (default CSV)"""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(FORMATS)}")
+        return fmt
+    extension = os.path.splitext(path)[1].lower()
+    return 'ndjson' if extension in ('.ndjson', '.jsonl', '.json') else 'csv'
+
+
+def write_stream(stream: RowStream, path: str, fmt: str, total: Optional[int] = None,
+                 progress: Optional[Progress] = None) -> int:
+    """Write every row of stream to path and close it; returns the number of rows written
+
+    Only one batch is held at a time. The file is written under a temporary
+    name and renamed when complete, so a failed or cancelled export never
+    leaves a truncated file behind.
+    """
+    partial = path + '.part'
+    count = 0
+    try:
+        with stream, open(partial, 'w', newline='', encoding='utf-8') as f:
+            columns = stream.columns
+            if fmt == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                write = writer.writerows
+            else:
+                write = lambda rows: f.writelines(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+
+            for rows in stream.batches():
+                write(rows)
+                count += len(rows)
+                if progress:
+                    progress(count, total)
+        if stream.cancelled:
+            raise InterruptedError("Export cancelled")
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return count
+
+
+def export_department(data: EmployeeData, dept_name: str, path: str, fmt: Optional[str] = None,
+                      progress: Optional[Progress] = None, as_of: Optional[str] = None) -> int:
+    """Export a department listing in the Departments tab order, optionally as of a date"""
+    as_of = check_as_of(as_of)
+    if as_of:
+        total = data.count('department_count_as_of', (as_of, dept_name))
+        stream = data.stream('employees_by_department_as_of', (as_of, dept_name), BATCH_SIZE)
+    else:
+        total = data.count('department_count', (dept_name,))
+        stream = data.stream('employees_by_department', (dept_name,), BATCH_SIZE)
+    return write_stream(stream, path, format_for(path, fmt), total, progress)
+
+
+def export_search(data: EmployeeData, search_term: str, path: str, fmt: Optional[str] = None,
+                  progress: Optional[Progress] = None) -> int:
+    """Export every match of a search (not just the first 100) in name order"""
+    name, params = data.search_page_query(search_term)
+    return write_stream(data.stream(name, params, BATCH_SIZE), path, format_for(path, fmt), None, progress)
+
+
+def export_current_employees(data: EmployeeData, path: str, fmt: Optional[str] = None,
+                             progress: Optional[Progress] = None) -> int:
+    """Export every current employee ordered by employee number"""
+    total = data.count('current_employee_count')
+    stream = data.stream('current_employees', (), BATCH_SIZE)
+    return write_stream(stream, path, format_for(path, fmt), total, progress)
+
+
+def describe_progress(count: int, total: Optional[int]) -> str:
+    if total:
+        return f"Exported {count:,} of {total:,} rows ({count * 100 // total}%)"
+    return f"Exported {count:,} rows"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Stream employee listings to CSV or NDJSON")
+    parser.add_argument('listing', choices=('department', 'search', 'all'))
+    parser.add_argument('term', nargs='?', help="department name or search term")
+    parser.add_argument('-o', '--output', required=True, help="output file")
+    parser.add_argument('--format', choices=FORMATS, help="default: from the output extension")
+    parser.add_argument('--as-of', help="department listing as of this date (YYYY-MM-DD)")
+    parser.add_argument('--database', help="database file (default: employees_db*.db beside this script)")
+    parser.add_argument('--log-slow-queries', action='store_true', help="print slow queries with their plans to stderr")
+    args = parser.parse_args(argv)
+    if args.listing != 'all' and not args.term:
+        parser.error(f"{args.listing} export needs a term")
+    if args.log_slow_queries:
+        log_slow_queries()
+
+    def progress(count, total):
+        print("\r" + describe_progress(count, total), end='', file=sys.stderr, flush=True)
+
+    data = EmployeeData.open(database_argument(args.database), migrate=False)
+    try:
+        if args.listing == 'department':
+            count = export_department(data, args.term, args.output, args.format, progress, args.as_of)
+        elif args.listing == 'search':
+            count = export_search(data, args.term, args.output, args.format, progress)
+        else:
+            count = export_current_employees(data, args.output, args.format, progress)
+        print(file=sys.stderr)
+        print(f"Wrote {count} rows to {args.output}")
+        return 0
+    finally:
+        data.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,21 +6,41 @@ import datetime
 from typing import List, Tuple, Optional
 import re
 
+from background import LatestOnlyWorker, QueryExecutor
+from db_connection import DEFAULT_MMAP_SIZE, find_database
+from db_migrations import LATEST_VERSION, migrate_file
+from employee_data import DatabaseConfig, EmployeeData
+from export import describe_progress, export_department, export_search
+from query_registry import check_as_of
+from virtual_table import ListRowModel, QueryRowModel, VirtualTable
+
 class EmployeeManagementSystem:
+    # Quiet period after the last keystroke before a live search runs
+    SEARCH_DEBOUNCE_MS = 250
+    
     def __init__(self):
         self.root = tk.Tk()
         self.db_file = self._find_database()
+        self.migrate_schema()
+        # The GUI only reads: share the file read-only and serve pages from the OS cache
+        self.data = EmployeeData(DatabaseConfig(
+            self.db_file, read_only=True, mmap_size=DEFAULT_MMAP_SIZE, temp_store='MEMORY'
+        ))
+        self.search_worker = LatestOnlyWorker(self.root, self.data.db, name="search")
+        self.executor = QueryExecutor(self.root, on_error=self.report_error)
+        self.status_var = tk.StringVar()
         self.current_user = None
+        self.root.protocol("WM_DELETE_WINDOW", self.shutdown)
+        self.schema_warning = self._check_schema()
+        self.data.detect_features()
         self.setup_styles()
         self.setup_main_window()
         
     def _find_database(self) -> str:
         """Find the database file in the current directory"""
-        current_folder = os.path.dirname(os.path.abspath(__file__))
-        
-        for file in os.listdir(current_folder):
-            if file.startswith("employees_db") and file.endswith(".db"):
-                return os.path.join(current_folder, file)
+        db_path = find_database(os.path.dirname(os.path.abspath(__file__)))
+        if db_path:
+            return db_path
         
         # If no database found, create a sample one or ask user to select
         messagebox.showwarning("Database Not Found", 
@@ -55,7 +75,7 @@ class EmployeeManagementSystem:
         style.theme_use('clam')
         style.configure('Title.TLabel', font=('Arial', 18, 'bold'), foreground=self.colors['primary'])
         style.configure('Heading.TLabel', font=('Arial', 14, 'bold'), foreground=self.colors['secondary'])
-        style.configure('Custom.Treeview', font=('Arial', 10))
+        style.configure('Custom.Treeview', font=('Arial', 10), rowheight=VirtualTable.ROW_HEIGHT)
         style.configure('Custom.Treeview.Heading', font=('Arial', 11, 'bold'))
         
     def setup_main_window(self):
@@ -71,177 +91,107 @@ class EmployeeManagementSystem:
         y = (self.root.winfo_screenheight() // 2) - (800 // 2)
         self.root.geometry(f"1200x800+{x}+{y}")
         
-    def run_query(self, query: str, params: tuple = ()) -> List[Tuple]:
-        """Execute database query with error handling"""
+        # Developer view of the query log
+        self.root.bind('<F12>', lambda e: self.show_query_stats())
+        
+    def migrate_schema(self):
+        """Bring the database schema (indexes) up to the latest version
+        
+        Runs before the read-only connections are opened, through a
+        short-lived read-write one, and only when the file can be written.
+        """
+        directory = os.path.dirname(os.path.abspath(self.db_file))
+        if not (os.access(self.db_file, os.W_OK) and os.access(directory, os.W_OK)):
+            return
         try:
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            conn.close()
-            return rows
+            migrate_file(self.db_file)
         except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"Error executing query: {str(e)}")
-            return []
+            # The app still works without the indexes, just slower
+            messagebox.showwarning("Schema Migration", f"Could not update database schema: {str(e)}")
     
-    def is_manager(self, emp_no: int) -> bool:
-        """Check if employee is a manager"""
-        query = "SELECT COUNT(*) FROM dept_manager WHERE emp_no = ?"
-        result = self.run_query(query, (emp_no,))
-        return result[0][0] > 0 if result else False
+    def _check_schema(self) -> str:
+        """Warning to keep on screen if the schema is still out of date, else ''"""
+        try:
+            version = self.data.schema_version()
+        except sqlite3.Error as e:
+            return f"⚠️ Could not check database schema: {str(e)}"
+        if version >= LATEST_VERSION:
+            return ""
+        return (f"⚠️ Database schema is at version {version} of {LATEST_VERSION}; "
+                "run db_migrations.py for faster queries")
     
-    def get_employee(self, emp_no: int) -> Optional[Tuple]:
-        """Get employee information"""
-        query = """
-            SELECT emp_no, first_name, last_name, gender, birth_date, hire_date 
-            FROM employees WHERE emp_no = ?
-        """
-        result = self.run_query(query, (emp_no,))
-        return result[0] if result else None
+    def report_error(self, error: Exception):
+        """Show a database error in the status bar without blocking the UI"""
+        self.status_var.set(f"⚠️ Database error: {str(error)}")
     
-    def get_employee_details(self, emp_no: int) -> dict:
-        """Get comprehensive employee details"""
-        query = """
-            SELECT 
-                e.emp_no, e.first_name, e.last_name, e.gender, 
-                e.birth_date, e.hire_date,
-                t.title,
-                s.salary,
-                d.dept_name,
-                dm.from_date as manager_from
-            FROM employees e
-            LEFT JOIN titles t ON e.emp_no = t.emp_no AND t.to_date = '9999-01-01'
-            LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
-            LEFT JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
-            LEFT JOIN departments d ON de.dept_no = d.dept_no
-            LEFT JOIN dept_manager dm ON e.emp_no = dm.emp_no AND dm.to_date = '9999-01-01'
-            WHERE e.emp_no = ?
-        """
-        result = self.run_query(query, (emp_no,))
-        if result:
-            row = result[0]
-            return {
-                'emp_no': row[0],
-                'first_name': row[1],
-                'last_name': row[2],
-                'gender': row[3],
-                'birth_date': row[4],
-                'hire_date': row[5],
-                'title': row[6] or 'N/A',
-                'salary': f"${row[7]:,}" if row[7] else 'N/A',
-                'department': row[8] or 'N/A',
-                'is_manager': bool(row[9])
-            }
-        return None
+    def report_progress(self, message: str):
+        """Show background work progress in the status bar"""
+        self.status_var.set(message)
     
-    def get_all_departments(self) -> List[str]:
-        """Get all department names"""
-        result = self.run_query("SELECT dept_name FROM departments ORDER BY dept_name")
-        return [dept[0] for dept in result]
-    
-    def get_employees_by_department(self, dept_name: str) -> List[Tuple]:
-        """Get employees in a specific department"""
-        query = """
-            SELECT 
-                e.emp_no, e.first_name, e.last_name, 
-                t.title, s.salary, e.hire_date,
-                CASE WHEN dm.emp_no IS NOT NULL THEN 'Yes' ELSE 'No' END as is_manager
-            FROM employees e
-            JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
-            JOIN departments d ON de.dept_no = d.dept_no
-            LEFT JOIN titles t ON e.emp_no = t.emp_no AND t.to_date = '9999-01-01'
-            LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
-            LEFT JOIN dept_manager dm ON e.emp_no = dm.emp_no AND dm.to_date = '9999-01-01'
-            WHERE d.dept_name = ?
-            ORDER BY s.salary DESC, e.hire_date
+    def export_listing(self, title: str, export_job):
+        """Ask for a file, then stream a listing to it on the executor
+        
+        export_job(path, progress) writes the file and returns the row count;
+        progress(count, total) updates are shown in the status bar.
         """
-        return self.run_query(query, (dept_name,))
+        path = filedialog.asksaveasfilename(
+            title=title, defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.ndjson"), ("All Files", "*.*")]
+        )
+        if not path:
+            return
+        
+        def run(progress):
+            # Runs on a worker thread
+            return export_job(path, lambda count, total: progress(describe_progress(count, total)))
+        
+        self.executor.submit(
+            run, on_progress=self.report_progress,
+            on_result=lambda count: self.report_progress(
+                f"✅ Exported {count} row(s) to {os.path.basename(path)}"
+            )
+        )
     
-    def search_employees(self, search_term: str) -> List[Tuple]:
-        """Advanced employee search"""
-        if not search_term.strip():
+    def get_all_departments(self) -> List[str]:
+        """Department names for the dropdown, reporting database errors in the status bar"""
+        try:
+            return self.data.get_all_departments()
+        except sqlite3.Error as e:
+            self.report_error(e)
             return []
-            
-        # Check if search term is numeric (employee number)
-        if search_term.isdigit():
-            query = """
-                SELECT e.emp_no, e.first_name, e.last_name, e.gender, 
-                       e.birth_date, e.hire_date, t.title, s.salary, d.dept_name
-                FROM employees e
-                LEFT JOIN titles t ON e.emp_no = t.emp_no AND t.to_date = '9999-01-01'
-                LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
-                LEFT JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
-                LEFT JOIN departments d ON de.dept_no = d.dept_no
-                WHERE e.emp_no = ?
-            """
-            return self.run_query(query, (int(search_term),))
-        
-        # Name search
-        terms = search_term.strip().lower().split()
-        if len(terms) == 1:
-            pattern = f"%{terms[0]}%"
-            query = """
-                SELECT e.emp_no, e.first_name, e.last_name, e.gender, 
-                       e.birth_date, e.hire_date, t.title, s.salary, d.dept_name
-                FROM employees e
-                LEFT JOIN titles t ON e.emp_no = t.emp_no AND t.to_date = '9999-01-01'
-                LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
-                LEFT JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
-                LEFT JOIN departments d ON de.dept_no = d.dept_no
-                WHERE LOWER(e.first_name) LIKE ? OR LOWER(e.last_name) LIKE ?
-                ORDER BY e.first_name, e.last_name
-                LIMIT 100
-            """
-            return self.run_query(query, (pattern, pattern))
-        else:
-            first_pattern = f"%{terms[0]}%"
-            last_pattern = f"%{terms[1]}%"
-            query = """
-                SELECT e.emp_no, e.first_name, e.last_name, e.gender, 
-                       e.birth_date, e.hire_date, t.title, s.salary, d.dept_name
-                FROM employees e
-                LEFT JOIN titles t ON e.emp_no = t.emp_no AND t.to_date = '9999-01-01'
-                LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
-                LEFT JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
-                LEFT JOIN departments d ON de.dept_no = d.dept_no
-                WHERE LOWER(e.first_name) LIKE ? AND LOWER(e.last_name) LIKE ?
-                ORDER BY e.first_name, e.last_name
-                LIMIT 100
-            """
-            return self.run_query(query, (first_pattern, last_pattern))
     
-    def get_department_stats(self, dept_name: str) -> dict:
-        """Get department statistics"""
-        query = """
-            SELECT 
-                COUNT(*) as total_employees,
-                AVG(s.salary) as avg_salary,
-                MAX(s.salary) as max_salary,
-                MIN(s.salary) as min_salary,
-                COUNT(DISTINCT dm.emp_no) as managers_count
-            FROM employees e
-            JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
-            JOIN departments d ON de.dept_no = d.dept_no
-            LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
-            LEFT JOIN dept_manager dm ON e.emp_no = dm.emp_no AND dm.to_date = '9999-01-01'
-            WHERE d.dept_name = ?
-        """
-        result = self.run_query(query, (dept_name,))
-        if result:
-            row = result[0]
-            return {
-                'total_employees': row[0],
-                'avg_salary': f"${row[1]:,.0f}" if row[1] else 'N/A',
-                'max_salary': f"${row[2]:,}" if row[2] else 'N/A',
-                'min_salary': f"${row[3]:,}" if row[3] else 'N/A',
-                'managers_count': row[4]
-            }
-        return {}
+    def load_session(self, emp_no: int) -> Optional[dict]:
+        """Load the login profile, reporting database errors in the status bar"""
+        try:
+            return self.data.load_session(emp_no)
+        except sqlite3.Error as e:
+            self.report_error(e)
+            return None
     
     def clear_window(self):
         """Clear all widgets from the window"""
         for widget in self.root.winfo_children():
             widget.destroy()
+        self.create_status_bar()
+    
+    def create_status_bar(self):
+        """Create the status line used for progress and error messages
+        
+        An outdated schema gets a line of its own below it, so later status
+        messages do not replace the warning.
+        """
+        self.status_var.set("")
+        if self.schema_warning:
+            tk.Label(
+                self.root, text=self.schema_warning,
+                font=('Arial', 9), fg=self.colors['danger'],
+                bg=self.colors['background'], anchor='w'
+            ).pack(side='bottom', fill='x', padx=10, pady=(0, 4))
+        tk.Label(
+            self.root, textvariable=self.status_var,
+            font=('Arial', 9), fg=self.colors['secondary'],
+            bg=self.colors['background'], anchor='w'
+        ).pack(side='bottom', fill='x', padx=10, pady=(0, 4))
     
     def create_header(self, parent, title: str, subtitle: str = ""):
         """Create a styled header"""
@@ -319,16 +269,15 @@ class EmployeeManagementSystem:
                 messagebox.showerror("Error", "Employee number must be numeric!")
                 return
             
-            emp_no = int(emp_no_str)
-            employee = self.get_employee(emp_no)
+            profile = self.load_session(int(emp_no_str))
             
-            if not employee:
+            if not profile:
                 messagebox.showerror("Error", "Employee not found! Please check your employee number.")
                 return
             
-            self.current_user = self.get_employee_details(emp_no)
+            self.current_user = profile
             
-            if self.is_manager(emp_no):
+            if profile['is_manager']:
                 self.show_manager_dashboard()
             else:
                 self.show_employee_dashboard()
@@ -484,7 +433,28 @@ class EmployeeManagementSystem:
             values=self.get_all_departments(),
             font=('Arial', 11), width=30, state='readonly'
         )
-        dept_dropdown.pack(side='left', padx=(0, 20))
+        dept_dropdown.pack(side='left', padx=(0, 10))
+        
+        export_btn = tk.Button(
+            controls_frame, text="💾 Export",
+            font=('Arial', 10, 'bold'),
+            bg=self.colors['accent'], fg='white',
+            relief='flat', cursor='hand2'
+        )
+        export_btn.pack(side='left', padx=(0, 10))
+        
+        # Blank shows the current state; a date shows the department as it was then
+        tk.Label(
+            controls_frame, text="📅 As of:",
+            font=('Arial', 10, 'bold'), bg='white'
+        ).pack(side='left', padx=(0, 5))
+        
+        as_of_var = tk.StringVar()
+        as_of_entry = tk.Entry(
+            controls_frame, textvariable=as_of_var,
+            font=('Arial', 11), width=12
+        )
+        as_of_entry.pack(side='left', padx=(0, 20))
         
         # Stats frame
         stats_frame = tk.LabelFrame(
@@ -500,66 +470,95 @@ class EmployeeManagementSystem:
         )
         stats_text.pack(padx=10, pady=5)
         
-        # Employees table
-        table_frame = tk.Frame(dept_frame, bg='white')
-        table_frame.pack(expand=True, fill='both', padx=20, pady=10)
-        
+        # Employees table: only the visible rows exist as Treeview items
         columns = ("EmpNo", "First Name", "Last Name", "Title", "Salary", "Hire Date", "Manager")
-        tree = ttk.Treeview(
-            table_frame, columns=columns, show="headings",
-            style='Custom.Treeview'
-        )
-        
-        # Configure columns
         column_widths = {"EmpNo": 80, "First Name": 120, "Last Name": 120, 
                         "Title": 150, "Salary": 100, "Hire Date": 100, "Manager": 80}
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=column_widths.get(col, 100), minwidth=50)
-        
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=tree.yview)
-        h_scrollbar = ttk.Scrollbar(table_frame, orient='horizontal', command=tree.xview)
-        tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        tree.grid(row=0, column=0, sticky='nsew')
-        v_scrollbar.grid(row=0, column=1, sticky='ns')
-        h_scrollbar.grid(row=1, column=0, sticky='ew')
-        
-        table_frame.grid_rowconfigure(0, weight=1)
-        table_frame.grid_columnconfigure(0, weight=1)
-        
-        def load_department_data(event=None):
-            # Clear existing data
-            for item in tree.get_children():
-                tree.delete(item)
-            
-            dept_name = dept_var.get()
-            if not dept_name:
+        table = VirtualTable(
+            dept_frame, columns, column_widths, executor=self.executor,
+            formatters={4: lambda salary: f"${salary:,}"}, bg='white'
+        )
+        table.pack(expand=True, fill='both', padx=20, pady=10)
+        
+        # The listing on screen, so late statistics for an earlier choice are dropped
+        shown = {'dept_name': None, 'as_of': None}
+        
+        def selected_as_of():
+            """(ok, as-of date or None for the current state); reports bad dates"""
+            try:
+                return True, check_as_of(as_of_var.get())
+            except ValueError as e:
+                messagebox.showerror("As-of Date", str(e))
+                return False, None
+        
+        def fetch_department_stats(dept_name, as_of, progress):
+            # Runs on a worker thread
+            progress(f"Loading statistics for {dept_name}...")
+            return dept_name, as_of, self.data.get_department_stats(dept_name, as_of)
+        
+        def show_department_stats(data):
+            dept_name, as_of, stats = data
+            if not table.winfo_exists() or (dept_name, as_of) != (shown['dept_name'], shown['as_of']):
                 return
             
-            # Load employees
-            employees = self.get_employees_by_department(dept_name)
-            for emp in employees:
-                # Format salary
-                formatted_emp = list(emp)
-                if formatted_emp[4]:  # salary
-                    formatted_emp[4] = f"${formatted_emp[4]:,}"
-                tree.insert("", "end", values=formatted_emp)
-            
             # Update statistics
-            stats = self.get_department_stats(dept_name)
             stats_text.config(state='normal')
             stats_text.delete('1.0', tk.END)
             stats_text.insert('1.0', 
-                f"Total Employees: {stats.get('total_employees', 0)}\n"
+                f"Total Employees: {stats.get('total_employees', 0)}"
+                f"{f' (as of {as_of})' if as_of else ''}\n"
                 f"Average Salary: {stats.get('avg_salary', 'N/A')}\n"
                 f"Salary Range: {stats.get('min_salary', 'N/A')} - {stats.get('max_salary', 'N/A')}"
             )
             stats_text.config(state='disabled')
         
+        def load_department_data(event=None):
+            dept_name = dept_var.get()
+            if not dept_name:
+                return
+            ok, as_of = selected_as_of()
+            if not ok:
+                return
+            shown.update(dept_name=dept_name, as_of=as_of)
+            when = f" as of {as_of}" if as_of else ""
+            
+            # Rows are paged in as the table scrolls, ordered like get_employees_by_department
+            # (salary DESC, hire_date); current listings page through department_rows_after
+            pager = None
+            if not as_of:
+                pager = lambda after, limit: self.data.department_rows_after(dept_name, after, limit)
+            model = QueryRowModel(
+                self.data, *self.data.department_listing(dept_name, as_of),
+                default_order=((4, True), (5, False)), pager=pager
+            )
+            table.set_model(
+                model, on_ready=lambda count: self.report_progress(
+                    f"Loaded {count} employee(s) of {dept_name}{when}"
+                )
+            )
+            self.executor.submit(
+                fetch_department_stats, dept_name, as_of,
+                on_result=show_department_stats, on_progress=self.report_progress
+            )
+        
+        def export_selected_department():
+            dept_name = dept_var.get()
+            if not dept_name:
+                messagebox.showinfo("Export", "Please select a department first!")
+                return
+            ok, as_of = selected_as_of()
+            if not ok:
+                return
+            self.export_listing(
+                f"Export {dept_name}" + (f" as of {as_of}" if as_of else ""),
+                lambda path, progress: export_department(
+                    self.data, dept_name, path, progress=progress, as_of=as_of
+                )
+            )
+        
         dept_dropdown.bind("<<ComboboxSelected>>", load_department_data)
+        as_of_entry.bind('<Return>', load_department_data)
+        export_btn.config(command=export_selected_department)
     
     def create_search_tab(self, notebook):
         """Create employee search tab"""
@@ -596,7 +595,15 @@ class EmployeeManagementSystem:
             bg=self.colors['warning'], fg='white',
             relief='flat', cursor='hand2'
         )
-        clear_btn.pack(side='left')
+        clear_btn.pack(side='left', padx=(0, 10))
+        
+        export_btn = tk.Button(
+            search_controls, text="💾 Export",
+            font=('Arial', 10, 'bold'),
+            bg=self.colors['accent'], fg='white',
+            relief='flat', cursor='hand2'
+        )
+        export_btn.pack(side='left')
         
         # Results info
         results_label = tk.Label(
@@ -606,72 +613,85 @@ class EmployeeManagementSystem:
         results_label.pack(side='right')
         
         # Results table
-        results_frame = tk.Frame(search_frame, bg='white')
-        results_frame.pack(expand=True, fill='both', padx=20, pady=10)
-        
         search_columns = ("EmpNo", "First Name", "Last Name", "Gender", 
                          "Birth Date", "Hire Date", "Title", "Salary", "Department")
-        search_tree = ttk.Treeview(
-            results_frame, columns=search_columns, show="headings",
-            style='Custom.Treeview'
-        )
-        
-        # Configure search columns
         search_widths = {"EmpNo": 70, "First Name": 100, "Last Name": 100, "Gender": 60,
                         "Birth Date": 90, "Hire Date": 90, "Title": 130, 
                         "Salary": 90, "Department": 120}
+        search_table = VirtualTable(
+            search_frame, search_columns, search_widths, executor=self.executor,
+            formatters={7: lambda salary: f"${salary:,}"}, bg='white'
+        )
+        search_table.pack(expand=True, fill='both', padx=20, pady=10)
         
-        for col in search_columns:
-            search_tree.heading(col, text=col)
-            search_tree.column(col, width=search_widths.get(col, 80), minwidth=50)
-        
-        # Scrollbars for search
-        search_v_scroll = ttk.Scrollbar(results_frame, orient='vertical', command=search_tree.yview)
-        search_h_scroll = ttk.Scrollbar(results_frame, orient='horizontal', command=search_tree.xview)
-        search_tree.configure(yscrollcommand=search_v_scroll.set, xscrollcommand=search_h_scroll.set)
-        
-        search_tree.grid(row=0, column=0, sticky='nsew')
-        search_v_scroll.grid(row=0, column=1, sticky='ns')
-        search_h_scroll.grid(row=1, column=0, sticky='ew')
-        
-        results_frame.grid_rowconfigure(0, weight=1)
-        results_frame.grid_columnconfigure(0, weight=1)
+        # Pending debounce timer for search-as-you-type
+        debounce = {'after_id': None}
         
-        def perform_search():
-            # Clear existing results
-            for item in search_tree.get_children():
-                search_tree.delete(item)
-            
-            search_term = search_var.get().strip()
-            if not search_term:
-                results_label.config(text="Please enter a search term")
+        def show_results(results):
+            # The tab may have been closed while the search ran
+            if not results_label.winfo_exists():
                 return
-            
-            results = self.search_employees(search_term)
-            
             if not results:
+                search_table.clear()
                 results_label.config(text="No employees found")
                 return
             
             # Display results
-            for emp in results:
-                formatted_emp = list(emp)
-                # Format salary
-                if formatted_emp[7]:  # salary column
-                    formatted_emp[7] = f"${formatted_emp[7]:,}"
-                search_tree.insert("", "end", values=formatted_emp)
-            
+            search_table.set_model(ListRowModel(results))
             results_label.config(text=f"Found {len(results)} employee(s)")
         
+        def show_error(error):
+            if not results_label.winfo_exists():
+                return
+            results_label.config(text="Search failed")
+            self.report_error(error)
+        
+        def perform_search(live=False):
+            if debounce['after_id']:
+                self.root.after_cancel(debounce['after_id'])
+                debounce['after_id'] = None
+            
+            search_term = search_var.get().strip()
+            if not search_term:
+                self.search_worker.cancel()
+                search_table.clear()
+                results_label.config(text="" if live else "Please enter a search term")
+                return
+            
+            # Runs off the Tk thread; a newer search interrupts this one
+            results_label.config(text="Searching...")
+            self.search_worker.submit(
+                lambda: self.data.search_employees(search_term),
+                show_results, show_error
+            )
+        
+        def schedule_search(*args):
+            if debounce['after_id']:
+                self.root.after_cancel(debounce['after_id'])
+            debounce['after_id'] = self.root.after(
+                self.SEARCH_DEBOUNCE_MS, lambda: perform_search(live=True)
+            )
+        
         def clear_search():
             search_var.set("")
-            for item in search_tree.get_children():
-                search_tree.delete(item)
-            results_label.config(text="")
+            perform_search(live=True)
+        
+        def export_results():
+            search_term = search_var.get().strip()
+            if not search_term:
+                messagebox.showinfo("Export", "Please enter a search term!")
+                return
+            # Every match is exported, not only the rows shown
+            self.export_listing(
+                f"Export search '{search_term}'",
+                lambda path, progress: export_search(self.data, search_term, path, progress=progress)
+            )
         
         search_btn.config(command=perform_search)
+        export_btn.config(command=export_results)
         clear_btn.config(command=clear_search)
         search_entry.bind('<Return>', lambda e: perform_search())
+        search_var.trace_add('write', schedule_search)
     
     def create_analytics_tab(self, notebook):
         """Create analytics and reports tab"""
@@ -682,33 +702,44 @@ class EmployeeManagementSystem:
         analytics_content = tk.Frame(analytics_frame, bg='white')
         analytics_content.pack(expand=True, fill='both', padx=20, pady=20)
         
-        # Overview cards
-        overview_frame = tk.Frame(analytics_content, bg='white')
-        overview_frame.pack(fill='x', pady=(0, 20))
+        # Point-in-time controls: blank shows the current state
+        controls_frame = tk.Frame(analytics_content, bg='white')
+        controls_frame.pack(fill='x', pady=(0, 10))
         
-        # Get overall statistics
-        total_employees_query = "SELECT COUNT(*) FROM employees"
-        total_employees = self.run_query(total_employees_query)[0][0]
+        tk.Label(
+            controls_frame, text="📅 As of (YYYY-MM-DD):",
+            font=('Arial', 10, 'bold'), bg='white'
+        ).pack(side='left', padx=(0, 10))
         
-        total_departments_query = "SELECT COUNT(*) FROM departments"
-        total_departments = self.run_query(total_departments_query)[0][0]
+        as_of_var = tk.StringVar()
+        as_of_entry = tk.Entry(
+            controls_frame, textvariable=as_of_var,
+            font=('Arial', 11), width=12
+        )
+        as_of_entry.pack(side='left', padx=(0, 10))
         
-        total_managers_query = "SELECT COUNT(DISTINCT emp_no) FROM dept_manager WHERE to_date = '9999-01-01'"
-        total_managers = self.run_query(total_managers_query)[0][0]
+        refresh_btn = tk.Button(
+            controls_frame, text="🔄 Refresh",
+            font=('Arial', 10, 'bold'),
+            bg=self.colors['accent'], fg='white',
+            relief='flat', cursor='hand2'
+        )
+        refresh_btn.pack(side='left')
         
-        avg_salary_query = "SELECT AVG(salary) FROM salaries WHERE to_date = '9999-01-01'"
-        avg_salary_result = self.run_query(avg_salary_query)
-        avg_salary = f"${avg_salary_result[0][0]:,.0f}" if avg_salary_result[0][0] else "N/A"
+        # Overview cards
+        overview_frame = tk.Frame(analytics_content, bg='white')
+        overview_frame.pack(fill='x', pady=(0, 20))
         
-        # Create stat cards
+        # Create stat cards; values are filled in once the background load finishes
         stats = [
-            ("👥 Total Employees", total_employees, self.colors['accent']),
-            ("🏢 Departments", total_departments, self.colors['success']),
-            ("👔 Managers", total_managers, self.colors['warning']),
-            ("💰 Avg Salary", avg_salary, self.colors['primary'])
+            ("👥 Total Employees", self.colors['accent']),
+            ("🏢 Departments", self.colors['success']),
+            ("👔 Managers", self.colors['warning']),
+            ("💰 Avg Salary", self.colors['primary'])
         ]
         
-        for i, (title, value, color) in enumerate(stats):
+        value_labels = []
+        for title, color in stats:
             card = tk.Frame(overview_frame, bg=color, relief='raised', bd=2)
             card.pack(side='left', fill='both', expand=True, padx=5)
             
@@ -718,11 +749,13 @@ class EmployeeManagementSystem:
                 fg='white', bg=color
             ).pack(pady=(10, 5))
             
-            tk.Label(
-                card, text=str(value),
+            value_label = tk.Label(
+                card, text="…",
                 font=('Arial', 16, 'bold'),
                 fg='white', bg=color
-            ).pack(pady=(0, 10))
+            )
+            value_label.pack(pady=(0, 10))
+            value_labels.append(value_label)
         
         # Department breakdown
         dept_frame = tk.LabelFrame(
@@ -735,7 +768,7 @@ class EmployeeManagementSystem:
         dept_columns = ("Department", "Employees", "Managers", "Avg Salary", "Max Salary")
         dept_tree = ttk.Treeview(
             dept_frame, columns=dept_columns, show="headings",
-            style='Custom.Treeview', height=10
+            style='Custom.Treeview', height=6
         )
         
         for col in dept_columns:
@@ -744,22 +777,273 @@ class EmployeeManagementSystem:
         
         dept_tree.pack(expand=True, fill='both', padx=10, pady=10)
         
-        # Load department analytics
-        departments = self.get_all_departments()
-        for dept in departments:
-            stats = self.get_department_stats(dept)
-            dept_tree.insert("", "end", values=(
-                dept,
-                stats.get('total_employees', 0),
-                stats.get('managers_count', 0),
-                stats.get('avg_salary', 'N/A'),
-                stats.get('max_salary', 'N/A')
-            ))
+        # Salary distribution of the current staff per department, title or gender
+        distribution_frame = tk.LabelFrame(
+            analytics_content, text="💵 Salary Distribution (current)",
+            font=('Arial', 12, 'bold'), bg='white'
+        )
+        distribution_frame.pack(fill='both', expand=True, pady=10)
+        
+        distribution_controls = tk.Frame(distribution_frame, bg='white')
+        distribution_controls.pack(fill='x', padx=10, pady=(10, 0))
+        
+        tk.Label(
+            distribution_controls, text="Per:",
+            font=('Arial', 10, 'bold'), bg='white'
+        ).pack(side='left', padx=(0, 10))
+        
+        distribution_groups = {"Department": 'department', "Title": 'title', "Gender": 'gender'}
+        distribution_var = tk.StringVar(value="Department")
+        distribution_dropdown = ttk.Combobox(
+            distribution_controls, textvariable=distribution_var,
+            values=list(distribution_groups), font=('Arial', 10), width=12, state='readonly'
+        )
+        distribution_dropdown.pack(side='left', padx=(0, 10))
+        
+        buckets_label = tk.Label(distribution_controls, text="", font=('Arial', 9), bg='white')
+        buckets_label.pack(side='left')
+        
+        distribution_columns = ("Group", "Employees", "P10", "P25", "Median", "P75", "P90", "Histogram")
+        distribution_tree = ttk.Treeview(
+            distribution_frame, columns=distribution_columns, show="headings",
+            style='Custom.Treeview', height=6
+        )
+        for col in distribution_columns:
+            distribution_tree.heading(col, text=col)
+            distribution_tree.column(col, width=90, minwidth=60)
+        distribution_tree.column("Group", width=160)
+        distribution_tree.column("Histogram", width=200)
+        distribution_tree.pack(expand=True, fill='both', padx=10, pady=10)
+        
+        distribution = {'result': None}
+        bars = "▁▂▃▄▅▆▇█"
+        
+        def show_distribution_group(event=None):
+            result = distribution['result']
+            distribution_tree.delete(*distribution_tree.get_children())
+            if result is None:
+                return
+            group = distribution_groups[distribution_var.get()]
+            for row in result.groups:
+                if row.group != group:
+                    continue
+                peak = max(row.histogram, default=0) or 1
+                # One bar per bucket, scaled to the group's fullest bucket
+                histogram = "".join(bars[count * (len(bars) - 1) // peak] for count in row.histogram)
+                distribution_tree.insert("", "end", values=(
+                    row.value, row.employees,
+                    *(f"${value:,}" if value is not None else 'N/A'
+                      for value in (row.p10, row.p25, row.median, row.p75, row.p90)),
+                    histogram
+                ))
+        
+        def show_distribution(result):
+            if not distribution_tree.winfo_exists():
+                return
+            distribution['result'] = result
+            if result.groups:
+                last = result.bucket_start + len(result.groups[0].histogram) * result.bucket_width
+                buckets_label.config(
+                    text=f"Histogram: ${result.bucket_start:,} to ${last:,} in ${result.bucket_width:,} steps"
+                )
+            show_distribution_group()
+        
+        distribution_dropdown.bind('<<ComboboxSelected>>', show_distribution_group)
+        
+        # Monthly trends, read from the on-disk series cache
+        trend_frame = tk.LabelFrame(
+            analytics_content, text="📉 Monthly Trends",
+            font=('Arial', 12, 'bold'), bg='white'
+        )
+        trend_frame.pack(fill='both', expand=True, pady=10)
+        
+        trend_controls = tk.Frame(trend_frame, bg='white')
+        trend_controls.pack(fill='x', padx=10, pady=(10, 0))
+        
+        all_departments = "All departments"
+        metrics = {"Headcount": 'headcount', "Hires": 'hires',
+                   "Departures": 'departures', "Payroll": 'payroll'}
+        
+        tk.Label(
+            trend_controls, text="Department:",
+            font=('Arial', 10, 'bold'), bg='white'
+        ).pack(side='left', padx=(0, 10))
+        
+        trend_dept_var = tk.StringVar(value=all_departments)
+        trend_dept_dropdown = ttk.Combobox(
+            trend_controls, textvariable=trend_dept_var,
+            values=[all_departments], font=('Arial', 10), width=25, state='readonly'
+        )
+        trend_dept_dropdown.pack(side='left', padx=(0, 10))
+        
+        tk.Label(
+            trend_controls, text="Metric:",
+            font=('Arial', 10, 'bold'), bg='white'
+        ).pack(side='left', padx=(0, 10))
+        
+        trend_metric_var = tk.StringVar(value="Headcount")
+        trend_metric_dropdown = ttk.Combobox(
+            trend_controls, textvariable=trend_metric_var,
+            values=list(metrics), font=('Arial', 10), width=12, state='readonly'
+        )
+        trend_metric_dropdown.pack(side='left')
+        
+        trend_canvas = tk.Canvas(trend_frame, bg='white', height=180, highlightthickness=0)
+        trend_canvas.pack(expand=True, fill='both', padx=10, pady=10)
+        
+        # The loaded MonthlySeries; redrawing (on resize or a new choice) never queries
+        trend = {'series': None}
+        
+        def draw_trend(event=None):
+            trend_canvas.delete('all')
+            series = trend['series']
+            if series is None or not series.departments:
+                return
+            dept_name = trend_dept_var.get()
+            chosen = series.total() if dept_name == all_departments else series.by_name(dept_name)
+            metric = metrics[trend_metric_var.get()]
+            values = getattr(chosen, metric)
+            months = series.months
+            
+            width, height = trend_canvas.winfo_width(), trend_canvas.winfo_height()
+            left, right, top, bottom = 90, width - 15, 10, height - 25
+            if right <= left or bottom <= top or len(values) < 2:
+                return
+            low, high = min(0, min(values)), max(values)
+            span = (high - low) or 1
+            money = metric == 'payroll'
+            
+            def y(value):
+                return bottom - (value - low) * (bottom - top) / span
+            
+            trend_canvas.create_line(left, top, left, bottom, fill=self.colors['secondary'])
+            trend_canvas.create_line(left, bottom, right, bottom, fill=self.colors['secondary'])
+            for value in (low, high):
+                trend_canvas.create_text(
+                    left - 5, y(value), anchor='e', font=('Arial', 8),
+                    text=f"${value:,}" if money else f"{value:,}"
+                )
+            step = (right - left) / (len(values) - 1)
+            for index in (0, len(months) // 2, len(months) - 1):
+                trend_canvas.create_text(
+                    left + index * step, bottom + 12, font=('Arial', 8), text=months[index]
+                )
+            points = []
+            for index, value in enumerate(values):
+                points.extend((left + index * step, y(value)))
+            trend_canvas.create_line(*points, fill=self.colors['accent'], width=2)
+        
+        def show_trend(series):
+            if not trend_canvas.winfo_exists():
+                return
+            trend['series'] = series
+            names = sorted(department.dept_name for department in series.departments.values())
+            trend_dept_dropdown.config(values=[all_departments] + names)
+            if trend_dept_var.get() not in names:
+                trend_dept_var.set(all_departments)
+            draw_trend()
+        
+        trend_canvas.bind('<Configure>', draw_trend)
+        trend_dept_dropdown.bind('<<ComboboxSelected>>', draw_trend)
+        trend_metric_dropdown.bind('<<ComboboxSelected>>', draw_trend)
+        
+        # Date of the latest request; older results arriving late are dropped
+        requested = {'as_of': None}
+        
+        def fetch_analytics(as_of, progress):
+            # Runs on a worker thread: overall statistics and the breakdown in two queries
+            progress("Loading analytics..." if not as_of else f"Loading analytics as of {as_of}...")
+            return as_of, self.data.analytics.overview(as_of), self.data.analytics.department_breakdown(as_of)
+        
+        def show_analytics(data):
+            as_of, overview, breakdown = data
+            # The dashboard may have been closed while the query ran
+            if not dept_tree.winfo_exists() or as_of != requested['as_of']:
+                return
+            
+            avg_salary = f"${overview.avg_salary:,.0f}" if overview.avg_salary else "N/A"
+            values = (overview.total_employees, overview.total_departments,
+                      overview.total_managers, avg_salary)
+            for value_label, value in zip(value_labels, values):
+                value_label.config(text=str(value))
+            
+            # Load department analytics
+            dept_tree.delete(*dept_tree.get_children())
+            for dept in breakdown:
+                dept_tree.insert("", "end", values=(
+                    dept.dept_name,
+                    dept.total_employees,
+                    dept.managers_count,
+                    f"${dept.avg_salary:,.0f}" if dept.avg_salary else 'N/A',
+                    f"${dept.max_salary:,}" if dept.max_salary else 'N/A'
+                ))
+            self.report_progress("Analytics loaded" + (f" as of {as_of}" if as_of else ""))
+        
+        def load_analytics(event=None):
+            try:
+                as_of = check_as_of(as_of_var.get())
+            except ValueError as e:
+                messagebox.showerror("As-of Date", str(e))
+                return
+            requested['as_of'] = as_of
+            for value_label in value_labels:
+                value_label.config(text="…")
+            self.executor.submit(fetch_analytics, as_of, on_result=show_analytics, on_progress=self.report_progress)
+            # Cheap after the first build: the cache only sweeps history added since
+            self.executor.submit(self.data.monthly_series, on_result=show_trend)
+            self.executor.submit(self.data.analytics.salary_distributions, on_result=show_distribution)
+        
+        refresh_btn.config(command=load_analytics)
+        as_of_entry.bind('<Return>', load_analytics)
+        load_analytics()
+    
+    def show_query_stats(self):
+        """Open a window listing the top queries by total time and recent slow queries"""
+        if self.data.log is None:
+            return
+        window = tk.Toplevel(self.root)
+        window.title("🐢 Query Statistics")
+        window.geometry("1000x600")
+        
+        text = tk.Text(window, font=('Courier', 9), wrap='none', bg=self.colors['background'])
+        text.pack(expand=True, fill='both', padx=10, pady=10)
+        
+        def refresh():
+            lines = [self.data.log.report(30), "", "Recent slow queries:"]
+            for event in reversed(self.data.log.recent_slow):
+                lines.append(
+                    f"{event['elapsed_ms']:.1f} ms  {event['rows']} rows  {event['caller']}  "
+                    f"{event['params']}  {event['sql'][:100]}"
+                )
+                lines.extend(f"    {detail}" for detail in event['plan'] or [])
+            text.config(state='normal')
+            text.delete('1.0', tk.END)
+            text.insert('1.0', "\n".join(lines))
+            text.config(state='disabled')
+        
+        tk.Button(
+            window, text="🔄 Refresh",
+            font=('Arial', 10, 'bold'),
+            bg=self.colors['accent'], fg='white',
+            relief='flat', cursor='hand2', command=refresh
+        ).pack(pady=(0, 10))
+        refresh()
+    
+    def shutdown(self):
+        """Close database connections and destroy the main window"""
+        self.search_worker.cancel()
+        self.search_worker.stop()
+        self.executor.shutdown()
+        self.data.close()
+        self.root.destroy()
     
     def run(self):
         """Start the application"""
         self.show_login()
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.data.close()
 
 # Create and run the application
 if __name__ == "__main__":
@@ -769,11 +1053,3 @@ if __name__ == "__main__":
     except Exception as e:
         messagebox.showerror("Application Error", f"Failed to start application: {str(e)}")
         print(f"Error: {str(e)}")
-
-
-
-
-
-
-
-
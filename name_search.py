@@ -0,0 +1,36 @@
+import sqlite3
+from typing import List, Optional
+
+
+# The trigram tokenizer can only use its index for runs of 3+ characters
+MIN_TERM_LENGTH = 3
+
+
+def is_available(conn: sqlite3.Connection) -> bool:
+    """Check whether the employee_name_fts index has been built"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'employee_name_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def _phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def match_expression(terms: List[str]) -> Optional[str]:
+    """Build the FTS5 MATCH string for a name search, or None to fall back to LIKE
+
+    One term matches either name; two terms match first and last name
+    respectively, mirroring the LIKE '%term%' branches in search_employees.
+    Terms that are too short for trigrams or contain LIKE wildcards keep
+    the LIKE path so results do not change.
+    """
+    terms = terms[:2]
+    for term in terms:
+        if len(term) < MIN_TERM_LENGTH or '%' in term or '_' in term:
+            return None
+
+    if len(terms) == 1:
+        return "{first_name last_name} : " + _phrase(terms[0])
+    return f"first_name : {_phrase(terms[0])} AND last_name : {_phrase(terms[1])}"
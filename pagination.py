@@ -0,0 +1,57 @@
+import base64
+import json
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+
+class Page(NamedTuple):
+    """One page of a keyset-paginated listing"""
+    rows: List[Tuple]
+    next_token: Optional[str]
+    has_more: bool
+
+
+# Positions of the sort key columns in each listing's rows
+DEPARTMENT_KEY = (4, 5, 0)   # salary DESC, hire_date, emp_no
+SEARCH_KEY = (1, 2, 0)       # first_name, last_name, emp_no
+
+# Salary used for the first department page: above every real salary
+FIRST_SALARY = 2 ** 62
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_token(kind: str, scope: str, key: Sequence) -> str:
+    """Pack a listing kind, its scope (department or search term) and the last sort key"""
+    payload = json.dumps([kind, scope, list(key)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_token(token: str, kind: str, scope: str) -> list:
+    """Return the sort key stored in a token, checking it belongs to this listing"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        token_kind, token_scope, key = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid page token: {token!r}") from e
+    if token_kind != kind or token_scope != scope:
+        raise ValueError("Page token belongs to a different listing")
+    return key
+
+
+def check_page_size(page_size: int) -> int:
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+    return page_size
+
+
+def make_page(rows: List[Tuple], page_size: int, kind: str, scope: str,
+              key_columns: Sequence[int]) -> Page:
+    """Build a Page from up to page_size + 1 fetched rows"""
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_token = None
+    if has_more:
+        last = rows[-1]
+        next_token = encode_token(kind, scope, [last[i] for i in key_columns])
+    return Page(rows, next_token, has_more)
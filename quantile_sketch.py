@@ -0,0 +1,100 @@
+import math
+from typing import Dict, Iterable, Optional
+
+DEFAULT_RELATIVE_ACCURACY = 0.005
+# Distinct values counted exactly before a sketch switches to log buckets
+DEFAULT_MAX_EXACT = 4096
+
+
+def nearest_rank(count: int, fraction: float) -> int:
+    """0-based index of the nearest-rank percentile among count sorted values"""
+    return max(0, min(count - 1, int(round(fraction * count + 0.5)) - 1))
+
+
+class QuantileSketch:
+    """Mergeable quantile summary of non-negative integers (salaries)
+
+    Values are counted exactly, so quantiles are exact, until more than
+    max_exact distinct values have been seen. From then on counts are kept
+    per logarithmic bucket (as in DDSketch): every quantile is within
+    relative_accuracy of the true value, and memory stays bounded by the
+    range of the data rather than the number of values. Sketches with the
+    same relative_accuracy merge by adding counts, so groups can be
+    summarized separately (or in parallel) and combined afterwards.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+                 max_exact: int = DEFAULT_MAX_EXACT):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_exact = max_exact
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.count = 0
+        self.counts: Dict[int, int] = {}
+        self.exact = True
+
+    def _key(self, value: int) -> int:
+        return math.ceil(math.log(value, self.gamma)) if value > 0 else 0
+
+    def _value(self, key: int) -> int:
+        """Representative of a bucket: its midpoint in relative terms"""
+        return round(2 * self.gamma ** key / (self.gamma + 1)) if key else 0
+
+    def _collapse(self):
+        buckets: Dict[int, int] = {}
+        for value, count in self.counts.items():
+            key = self._key(value)
+            buckets[key] = buckets.get(key, 0) + count
+        self.counts = buckets
+        self.exact = False
+
+    def add(self, value: int, count: int = 1):
+        self.count += count
+        counts = self.counts
+        if self.exact:
+            counts[value] = counts.get(value, 0) + count
+            if len(counts) > self.max_exact:
+                self._collapse()
+        else:
+            key = self._key(value)
+            counts[key] = counts.get(key, 0) + count
+
+    def merge(self, other: 'QuantileSketch'):
+        """Add other's counts to this sketch"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative_accuracy can be merged")
+        if self.exact and not other.exact:
+            self._collapse()
+        counts = self.counts
+        for key, count in other.counts.items():
+            if other.exact and not self.exact:
+                key = self._key(key)
+            counts[key] = counts.get(key, 0) + count
+        self.count += other.count
+        if self.exact and len(counts) > self.max_exact:
+            self._collapse()
+
+    def quantiles(self, fractions: Iterable[float]) -> list:
+        """Nearest-rank quantiles in one walk over the sorted distinct values or buckets"""
+        fractions = list(fractions)
+        if not self.count:
+            return [None] * len(fractions)
+        wanted = sorted((nearest_rank(self.count, fraction), position)
+                        for position, fraction in enumerate(fractions))
+        results: list = [None] * len(fractions)
+        seen = 0
+        pending = iter(wanted)
+        rank, position = next(pending)
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            while rank < seen:
+                results[position] = key if self.exact else self._value(key)
+                following = next(pending, None)
+                if following is None:
+                    return results
+                rank, position = following
+        return results
+
+    def quantile(self, fraction: float) -> Optional[int]:
+        return self.quantiles((fraction,))[0]
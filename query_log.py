@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+# Silent unless the application configures logging (see log_slow_queries)
+logger.addHandler(logging.NullHandler())
+
+DEFAULT_SLOW_MS = 100.0
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+# Not the digits of numbered parameters such as ?1
+_NUMBER = re.compile(r"(?<!\?)\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# Frames that belong to the query plumbing rather than to the code that asked
+_PLUMBING = {'query_log.py', 'query_registry.py', 'result_cache.py', 'streaming.py'}
+_DATA_HELPERS = {'execute', 'execute_named', 'count', 'stream', 'stream_sql', 'run', '<lambda>'}
+
+
+# Statements come from a small fixed set, so each is only normalized once
+@lru_cache(maxsize=1024)
+def normalize(sql: str) -> str:
+    """SQL with literals replaced by ? and whitespace collapsed"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    return _IN_LIST.sub('(...)', sql)
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """Short stable id for every execution of the same statement shape"""
+    return hashlib.sha1(normalize(sql).encode('utf-8')).hexdigest()[:12]
+
+
+def params_shape(params) -> str:
+    """Types of the parameters without their values, e.g. (int, str)"""
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in params) + ")"
+
+
+def calling_method() -> str:
+    """module.function of the nearest caller outside the query plumbing"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        plumbing = filename in _PLUMBING or (
+            filename == 'employee_data.py' and code.co_name in _DATA_HELPERS)
+        if not plumbing:
+            return f"{os.path.splitext(filename)[0]}.{code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+class QueryLog:
+    """Per-statement execution statistics and a slow-query log
+
+    Executions are grouped by fingerprint. Any execution slower than slow_ms
+    is kept in recent_slow together with its EXPLAIN QUERY PLAN, which is
+    captured once per fingerprint, and logged (logger "query_log", WARNING)
+    where the application has asked for it.
+    """
+
+    def __init__(self, slow_ms: Optional[float] = DEFAULT_SLOW_MS, max_slow: int = 100):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        self.recent_slow: "deque[dict]" = deque(maxlen=max_slow)
+
+    def record(self, conn: sqlite3.Connection, sql: str, params, elapsed: float,
+               rows: Optional[int], caller: Optional[str] = None):
+        """Account one execution; elapsed in seconds, rows returned (None if unknown)"""
+        caller = caller or calling_method()
+        shape = params_shape(params)
+        key = fingerprint(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {
+                    'fingerprint': key, 'sql': normalize(sql), 'calls': 0, 'total_time': 0.0,
+                    'max_time': 0.0, 'rows': 0, 'slow_calls': 0,
+                    'params_shapes': set(), 'callers': set(), 'plan': None,
+                }
+            entry['calls'] += 1
+            entry['total_time'] += elapsed
+            entry['max_time'] = max(entry['max_time'], elapsed)
+            entry['rows'] += rows or 0
+            entry['params_shapes'].add(shape)
+            entry['callers'].add(caller)
+            slow = self.slow_ms is not None and elapsed * 1000 >= self.slow_ms
+            if slow:
+                entry['slow_calls'] += 1
+            needs_plan = slow and entry['plan'] is None
+
+        if not slow:
+            return
+        if needs_plan:
+            plan = explain(conn, sql, params)
+            with self._lock:
+                entry['plan'] = plan
+        event = {
+            'fingerprint': key, 'sql': entry['sql'], 'params': shape, 'caller': caller,
+            'elapsed_ms': elapsed * 1000, 'rows': rows, 'plan': entry['plan'],
+        }
+        with self._lock:
+            self.recent_slow.append(event)
+        logger.warning(
+            "Slow query %s (%.1f ms, %s rows) from %s: %s params %s\n  %s",
+            key, elapsed * 1000, rows, caller, entry['sql'], shape,
+            "\n  ".join(entry['plan'] or ['(no plan)'])
+        )
+
+    def top(self, limit: int = 20, key: str = 'total_time') -> List[dict]:
+        """The statements with the largest `key`, as plain dicts"""
+        with self._lock:
+            entries = [
+                dict(entry, params_shapes=sorted(entry['params_shapes']),
+                     callers=sorted(entry['callers']),
+                     avg_time=entry['total_time'] / entry['calls'])
+                for entry in self._entries.values()
+            ]
+        entries.sort(key=lambda entry: entry[key], reverse=True)
+        return entries[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self.recent_slow.clear()
+
+    def report(self, limit: int = 20) -> str:
+        """Format the top statements by total time as a table"""
+        lines = [f"{'Fingerprint':<14}{'Calls':>7}{'Total ms':>11}{'Avg ms':>9}{'Max ms':>9}"
+                 f"{'Rows':>9}{'Slow':>6}  Caller / SQL"]
+        for entry in self.top(limit):
+            lines.append(
+                f"{entry['fingerprint']:<14}{entry['calls']:>7}{entry['total_time'] * 1000:>11.1f}"
+                f"{entry['avg_time'] * 1000:>9.2f}{entry['max_time'] * 1000:>9.2f}"
+                f"{entry['rows']:>9}{entry['slow_calls']:>6}  {', '.join(entry['callers'])}"
+            )
+            lines.append(f"{'':<14}{entry['sql'][:110]}")
+        return "\n".join(lines)
+
+
+def log_slow_queries():
+    """Print slow-query warnings to stderr (for the command-line tools)"""
+    logging.basicConfig(format="%(levelname)s %(name)s: %(message)s")
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Sequence) -> Optional[List[str]]:
+    """EXPLAIN QUERY PLAN details for sql, or None if it cannot be explained"""
+    try:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    except sqlite3.Error:
+        return None
@@ -0,0 +1,665 @@
+import datetime
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from query_log import QueryLog
+from result_cache import ResultCache
+
+
+# Shared column list and joins for the employee search variants
+_SEARCH_COLUMNS = """
+    SELECT e.emp_no, e.first_name, e.last_name, e.gender,
+           e.birth_date, e.hire_date, t.title, s.salary, d.dept_name
+"""
+
+_SEARCH_JOINS = """
+    LEFT JOIN titles t ON e.emp_no = t.emp_no AND t.to_date = '9999-01-01'
+    LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
+    LEFT JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
+    LEFT JOIN departments d ON de.dept_no = d.dept_no
+"""
+
+_SEARCH_SELECT = _SEARCH_COLUMNS + "    FROM employees e" + _SEARCH_JOINS
+
+# Best 100 matches from the trigram name index (see name_search.py)
+_NAME_MATCHES = """
+    WITH matches AS (
+        SELECT rowid AS emp_no, rank FROM employee_name_fts
+        WHERE employee_name_fts MATCH ?
+        ORDER BY rank
+        LIMIT 100
+    )
+"""
+
+# Keyset page conditions on (first_name, last_name, emp_no), all ascending
+_NAME_AFTER = """
+    AND (e.first_name, e.last_name, e.emp_no) > (?, ?, ?)
+    ORDER BY e.first_name, e.last_name, e.emp_no
+    LIMIT ?
+"""
+
+
+def _department_page(rows_sql: str) -> str:
+    """Keyset page over (salary DESC, hire_date, emp_no) of a department listing
+
+    Salary and hire date come from different history tables, so no index
+    holds the listing order: every page joins and sorts the department's
+    rows after the cursor, and costs about as much as a full listing. Only
+    current_employee keeps the order in an index (see _department_seek_page).
+    rows_sql takes the department as ?1; parameters: see department_page_params().
+    """
+    return f"""
+        SELECT * FROM ({rows_sql})
+        WHERE (?2 IS NOT NULL AND (salary < ?2 OR salary IS NULL
+                                   OR (salary = ?2 AND (hire_date, emp_no) > (?3, ?4))))
+           OR (?2 IS NULL AND salary IS NULL AND (hire_date, emp_no) > (?3, ?4))
+        ORDER BY salary DESC, hire_date, emp_no
+        LIMIT ?5
+    """
+
+
+def _department_seek_page(rows_sql: str) -> str:
+    """_department_page for a table indexed on (dept_name, salary DESC, hire_date)
+
+    Mixed sort directions rule out a single row-value comparison, so the
+    rows after the cursor are split into ranges that are each read by an
+    index seek, LIMITed and merged; deep pages cost the same as the first.
+    """
+    return f"""
+        SELECT * FROM (SELECT * FROM ({rows_sql}) WHERE salary = ?2 AND hire_date = ?3 AND emp_no > ?4
+                       ORDER BY emp_no LIMIT ?5)
+        UNION ALL
+        SELECT * FROM (SELECT * FROM ({rows_sql}) WHERE salary = ?2 AND hire_date > ?3
+                       ORDER BY hire_date, emp_no LIMIT ?5)
+        UNION ALL
+        SELECT * FROM (SELECT * FROM ({rows_sql}) WHERE salary < ?2
+                       ORDER BY salary DESC, hire_date, emp_no LIMIT ?5)
+        UNION ALL
+        SELECT * FROM (SELECT * FROM ({rows_sql})
+                       WHERE salary IS NULL AND (?2 IS NOT NULL OR (hire_date, emp_no) > (?3, ?4))
+                       ORDER BY hire_date, emp_no LIMIT ?5)
+        ORDER BY salary DESC, hire_date, emp_no
+        LIMIT ?5
+    """
+
+
+def department_page_params(dept_name: str, salary, hire_date: str, emp_no: int, limit: int) -> tuple:
+    """Parameters for a department_page query continuing after the given sort key"""
+    return dept_name, salary, hire_date, emp_no, limit
+
+
+# Point-in-time variants take the as-of date ('YYYY-MM-DD') as ?1. A history row
+# is valid on that date when from_date <= date < to_date; current rows end in 9999.
+# dept_emp_interval (migration 4) is an R*Tree over the dept_emp intervals in day
+# numbers, with the department and the employee as further (point) dimensions,
+# so who worked where on a date is found without reading every row of history.
+_AS_OF_DAY = "CAST(julianday(?1) AS INTEGER)"
+
+
+def interval_day(column: str) -> str:
+    """Day number of a date column as stored in dept_emp_interval"""
+    return f"COALESCE(CAST(julianday({column}) AS INTEGER), 0)"
+
+
+def department_key(column: str) -> str:
+    """Integer R*Tree coordinate for a dept_no: its four ASCII characters packed into 32 bits"""
+    return "(" + " | ".join(
+        f"(COALESCE(unicode(substr({column}, {position + 1}, 1)), 0) << {24 - 8 * position})"
+        for position in range(4)
+    ) + ")"
+
+
+def check_as_of(as_of: Optional[str]) -> Optional[str]:
+    """Validate an as-of date as YYYY-MM-DD; None or blank means the current state"""
+    if as_of is None or not as_of.strip():
+        return None
+    try:
+        return datetime.date.fromisoformat(as_of.strip()).isoformat()
+    except ValueError:
+        raise ValueError(f"As-of date must be YYYY-MM-DD, not {as_of!r}") from None
+
+
+def _as_of_value(column: str, table: str, emp_no: str) -> str:
+    """Correlated subquery for an employee's `column` of table on the as-of date"""
+    return f"""(SELECT {column} FROM {table}
+                WHERE emp_no = {emp_no} AND from_date <= ?1 AND to_date > ?1
+                ORDER BY from_date DESC LIMIT 1)"""
+
+
+_AS_OF_MANAGER = """(SELECT 1 FROM dept_manager dm
+                     WHERE dm.emp_no = {emp_no} AND dm.from_date <= ?1 AND dm.to_date > ?1)"""
+
+# Staff of the department named ?2 on the as-of date
+_AS_OF_MEMBERS = f"""
+    WITH dept AS (
+        SELECT {department_key('dept_no')} AS dept_key
+        FROM departments WHERE dept_name = ?2
+    ),
+    members AS (
+        SELECT i.emp_lo AS emp_no FROM dept
+        JOIN dept_emp_interval i
+          ON i.dept_lo <= dept.dept_key AND i.dept_hi >= dept.dept_key
+         AND i.from_day <= {_AS_OF_DAY} AND i.to_day > {_AS_OF_DAY}
+    )
+"""
+
+# Everyone in a department on the as-of date, as (dept_key, emp_no)
+_AS_OF_STAFF = f"""
+    SELECT i.dept_lo AS dept_key, i.emp_lo AS emp_no FROM dept_emp_interval i
+    WHERE i.from_day <= {_AS_OF_DAY} AND i.to_day > {_AS_OF_DAY}
+"""
+
+
+def _as_of_department_rows(members: str) -> str:
+    """Department listing on the as-of date over a `members` CTE"""
+    return members + f"""
+    SELECT
+        e.emp_no, e.first_name, e.last_name,
+        {_as_of_value('title', 'titles', 'e.emp_no')} as title,
+        {_as_of_value('salary', 'salaries', 'e.emp_no')} as salary,
+        e.hire_date,
+        CASE WHEN EXISTS {_AS_OF_MANAGER.format(emp_no='e.emp_no')} THEN 'Yes' ELSE 'No' END as is_manager
+    FROM members m
+    JOIN employees e ON e.emp_no = m.emp_no
+"""
+
+
+def _as_of_department_stats(members: str) -> str:
+    """Department figures on the as-of date over a `members` CTE
+
+    Materialized so each salary is looked up once, not once per aggregate.
+    """
+    return members + f"""
+        , member_values AS MATERIALIZED (
+            SELECT {_as_of_value('salary', 'salaries', 'm.emp_no')} as salary,
+                   {_AS_OF_MANAGER.format(emp_no='m.emp_no')} as manager
+            FROM members m
+        )
+        SELECT
+            COUNT(*) as total_employees,
+            AVG(salary) as avg_salary,
+            MAX(salary) as max_salary,
+            MIN(salary) as min_salary,
+            COUNT(manager) as managers_count
+        FROM member_values
+    """
+
+
+def _as_of_overview(staff: str) -> str:
+    """Employees hired by the date; the average is over the staff on that day"""
+    return f"""
+        SELECT
+            (SELECT COUNT(*) FROM employees WHERE hire_date <= ?1) as total_employees,
+            (SELECT COUNT(*) FROM departments) as total_departments,
+            (SELECT COUNT(DISTINCT emp_no) FROM dept_manager
+             WHERE from_date <= ?1 AND to_date > ?1) as total_managers,
+            (SELECT AVG({_as_of_value('salary', 'salaries', 'staff.emp_no')})
+             FROM (SELECT DISTINCT emp_no FROM ({staff})) staff) as avg_salary
+    """
+
+
+def _as_of_breakdown(staff: str, dept_key: str) -> str:
+    """Per-department figures on the as-of date; staff are grouped on dept_key, then named"""
+    return f"""
+        WITH staff AS MATERIALIZED (
+            SELECT s.dept_key,
+                   {_as_of_value('salary', 'salaries', 's.emp_no')} as salary,
+                   {_AS_OF_MANAGER.format(emp_no='s.emp_no')} as manager
+            FROM ({staff}) s
+        ),
+        totals AS (
+            SELECT dept_key, COUNT(*) as total_employees, AVG(salary) as avg_salary,
+                   MAX(salary) as max_salary, MIN(salary) as min_salary,
+                   COUNT(manager) as managers_count
+            FROM staff
+            GROUP BY dept_key
+        )
+        SELECT
+            d.dept_name,
+            COALESCE(t.total_employees, 0),
+            t.avg_salary, t.max_salary, t.min_salary,
+            COALESCE(t.managers_count, 0)
+        FROM departments d
+        LEFT JOIN totals t ON t.dept_key = {dept_key}
+        ORDER BY d.dept_name
+    """
+
+QUERIES: Dict[str, str] = {
+    'is_manager': "SELECT COUNT(*) FROM dept_manager WHERE emp_no = ? AND to_date = '9999-01-01'",
+
+    'employee': """
+        SELECT emp_no, first_name, last_name, gender, birth_date, hire_date
+        FROM employees WHERE emp_no = ?
+    """,
+
+    'employee_details': """
+        SELECT
+            e.emp_no, e.first_name, e.last_name, e.gender,
+            e.birth_date, e.hire_date,
+            t.title,
+            s.salary,
+            d.dept_name,
+            dm.from_date as manager_from
+        FROM employees e
+        LEFT JOIN titles t ON e.emp_no = t.emp_no AND t.to_date = '9999-01-01'
+        LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
+        LEFT JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
+        LEFT JOIN departments d ON de.dept_no = d.dept_no
+        LEFT JOIN dept_manager dm ON e.emp_no = dm.emp_no AND dm.to_date = '9999-01-01'
+        WHERE e.emp_no = ?
+    """,
+
+    'all_departments': "SELECT dept_name FROM departments ORDER BY dept_name",
+
+    'employees_by_department': """
+        SELECT
+            e.emp_no, e.first_name, e.last_name,
+            t.title, s.salary, e.hire_date,
+            CASE WHEN dm.emp_no IS NOT NULL THEN 'Yes' ELSE 'No' END as is_manager
+        FROM employees e
+        JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
+        JOIN departments d ON de.dept_no = d.dept_no
+        LEFT JOIN titles t ON e.emp_no = t.emp_no AND t.to_date = '9999-01-01'
+        LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
+        LEFT JOIN dept_manager dm ON e.emp_no = dm.emp_no AND dm.to_date = '9999-01-01'
+        WHERE d.dept_name = ?
+        ORDER BY s.salary DESC, e.hire_date
+    """,
+
+    # Unordered department listing and its size, for paging with VirtualTable
+    'department_rows': """
+        SELECT
+            e.emp_no, e.first_name, e.last_name,
+            t.title, s.salary, e.hire_date,
+            CASE WHEN dm.emp_no IS NOT NULL THEN 'Yes' ELSE 'No' END as is_manager
+        FROM employees e
+        JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
+        JOIN departments d ON de.dept_no = d.dept_no
+        LEFT JOIN titles t ON e.emp_no = t.emp_no AND t.to_date = '9999-01-01'
+        LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
+        LEFT JOIN dept_manager dm ON e.emp_no = dm.emp_no AND dm.to_date = '9999-01-01'
+        WHERE d.dept_name = ?
+    """,
+
+    'department_count': """
+        SELECT COUNT(*)
+        FROM employees e
+        JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
+        JOIN departments d ON de.dept_no = d.dept_no
+        WHERE d.dept_name = ?
+    """,
+
+    'department_page': _department_page("""
+        SELECT
+            e.emp_no, e.first_name, e.last_name,
+            t.title, s.salary, e.hire_date,
+            CASE WHEN dm.emp_no IS NOT NULL THEN 'Yes' ELSE 'No' END as is_manager
+        FROM employees e
+        JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
+        JOIN departments d ON de.dept_no = d.dept_no
+        LEFT JOIN titles t ON e.emp_no = t.emp_no AND t.to_date = '9999-01-01'
+        LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
+        LEFT JOIN dept_manager dm ON e.emp_no = dm.emp_no AND dm.to_date = '9999-01-01'
+        WHERE d.dept_name = ?1
+    """),
+
+    'search_by_emp_no': _SEARCH_SELECT + """
+        WHERE e.emp_no = ?
+    """,
+
+    'search_by_name': _SEARCH_SELECT + """
+        WHERE LOWER(e.first_name) LIKE ? OR LOWER(e.last_name) LIKE ?
+        ORDER BY e.first_name, e.last_name
+        LIMIT 100
+    """,
+
+    'search_by_full_name': _SEARCH_SELECT + """
+        WHERE LOWER(e.first_name) LIKE ? AND LOWER(e.last_name) LIKE ?
+        ORDER BY e.first_name, e.last_name
+        LIMIT 100
+    """,
+
+    'search_by_name_fts': _NAME_MATCHES + _SEARCH_COLUMNS + """
+        FROM matches m
+        JOIN employees e ON e.emp_no = m.emp_no
+    """ + _SEARCH_JOINS + """
+        ORDER BY m.rank, e.first_name, e.last_name
+    """,
+
+    'search_by_name_page': _SEARCH_SELECT + """
+        WHERE (LOWER(e.first_name) LIKE ? OR LOWER(e.last_name) LIKE ?)
+    """ + _NAME_AFTER,
+
+    'search_by_full_name_page': _SEARCH_SELECT + """
+        WHERE LOWER(e.first_name) LIKE ? AND LOWER(e.last_name) LIKE ?
+    """ + _NAME_AFTER,
+
+    'search_by_name_fts_page': _SEARCH_SELECT + """
+        WHERE e.emp_no IN (SELECT rowid FROM employee_name_fts WHERE employee_name_fts MATCH ?)
+    """ + _NAME_AFTER,
+
+    'current_employees': _SEARCH_SELECT + """
+        WHERE de.emp_no IS NOT NULL
+        ORDER BY e.emp_no
+    """,
+
+    'current_employee_count': "SELECT COUNT(*) FROM dept_emp WHERE to_date = '9999-01-01'",
+
+    'department_stats': """
+        SELECT
+            COUNT(*) as total_employees,
+            AVG(s.salary) as avg_salary,
+            MAX(s.salary) as max_salary,
+            MIN(s.salary) as min_salary,
+            COUNT(DISTINCT dm.emp_no) as managers_count
+        FROM employees e
+        JOIN dept_emp de ON e.emp_no = de.emp_no AND de.to_date = '9999-01-01'
+        JOIN departments d ON de.dept_no = d.dept_no
+        LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
+        LEFT JOIN dept_manager dm ON e.emp_no = dm.emp_no AND dm.to_date = '9999-01-01'
+        WHERE d.dept_name = ?
+    """,
+
+    'analytics_overview': """
+        SELECT
+            (SELECT COUNT(*) FROM employees) as total_employees,
+            (SELECT COUNT(*) FROM departments) as total_departments,
+            (SELECT COUNT(DISTINCT emp_no) FROM dept_manager
+             WHERE to_date = '9999-01-01') as total_managers,
+            (SELECT AVG(salary) FROM salaries
+             WHERE to_date = '9999-01-01') as avg_salary
+    """,
+
+    'department_breakdown': """
+        SELECT
+            d.dept_name,
+            COUNT(e.emp_no) as total_employees,
+            AVG(s.salary) as avg_salary,
+            MAX(s.salary) as max_salary,
+            MIN(s.salary) as min_salary,
+            COUNT(DISTINCT dm.emp_no) as managers_count
+        FROM departments d
+        LEFT JOIN dept_emp de ON de.dept_no = d.dept_no AND de.to_date = '9999-01-01'
+        LEFT JOIN employees e ON e.emp_no = de.emp_no
+        LEFT JOIN salaries s ON e.emp_no = s.emp_no AND s.to_date = '9999-01-01'
+        LEFT JOIN dept_manager dm ON e.emp_no = dm.emp_no AND dm.to_date = '9999-01-01'
+        GROUP BY d.dept_no
+        ORDER BY d.dept_name
+    """,
+
+    # Every current salary with the groups it is broken down by
+    'current_salaries': """
+        SELECT d.dept_name, t.title, e.gender, s.salary
+        FROM salaries s
+        JOIN employees e ON e.emp_no = s.emp_no
+        LEFT JOIN dept_emp de ON de.emp_no = s.emp_no AND de.to_date = '9999-01-01'
+        LEFT JOIN departments d ON d.dept_no = de.dept_no
+        LEFT JOIN titles t ON t.emp_no = s.emp_no AND t.to_date = '9999-01-01'
+        WHERE s.to_date = '9999-01-01'
+    """,
+
+    # Point-in-time variants: parameters are (as_of, <the current variant's>)
+    'employee_details_as_of': f"""
+        SELECT
+            e.emp_no, e.first_name, e.last_name, e.gender,
+            e.birth_date, e.hire_date,
+            {_as_of_value('title', 'titles', 'e.emp_no')},
+            {_as_of_value('salary', 'salaries', 'e.emp_no')},
+            (SELECT d.dept_name FROM dept_emp de
+             JOIN departments d ON de.dept_no = d.dept_no
+             WHERE de.emp_no = e.emp_no AND de.from_date <= ?1 AND de.to_date > ?1
+             ORDER BY de.from_date DESC LIMIT 1),
+            {_as_of_value('from_date', 'dept_manager', 'e.emp_no')} as manager_from
+        FROM employees e
+        WHERE e.emp_no = ?2 AND e.hire_date <= ?1
+    """,
+
+    'employees_by_department_as_of': _as_of_department_rows(_AS_OF_MEMBERS) + """
+        ORDER BY salary DESC, e.hire_date
+    """,
+
+    'department_rows_as_of': _as_of_department_rows(_AS_OF_MEMBERS),
+
+    'department_count_as_of': _AS_OF_MEMBERS + "SELECT COUNT(*) FROM members",
+
+    'department_stats_as_of': _as_of_department_stats(_AS_OF_MEMBERS),
+
+    'analytics_overview_as_of': _as_of_overview(_AS_OF_STAFF),
+
+    'department_breakdown_as_of': _as_of_breakdown(_AS_OF_STAFF, department_key('d.dept_no')),
+}
+
+# Point-in-time variants for databases without dept_emp_interval (before
+# migration 4): the same answers from date conditions on dept_emp, which
+# reads every dept_emp row of the department (or of the company)
+_HISTORY_AS_OF_MEMBERS = """
+    WITH members AS (
+        SELECT de.emp_no FROM departments d
+        JOIN dept_emp de ON de.dept_no = d.dept_no
+        WHERE d.dept_name = ?2 AND de.from_date <= ?1 AND de.to_date > ?1
+    )
+"""
+
+_HISTORY_AS_OF_STAFF = """
+    SELECT dept_no AS dept_key, emp_no FROM dept_emp
+    WHERE from_date <= ?1 AND to_date > ?1
+"""
+
+HISTORY_AS_OF_QUERIES: Dict[str, str] = {
+    'employees_by_department_as_of': _as_of_department_rows(_HISTORY_AS_OF_MEMBERS) + """
+        ORDER BY salary DESC, e.hire_date
+    """,
+
+    'department_rows_as_of': _as_of_department_rows(_HISTORY_AS_OF_MEMBERS),
+
+    'department_count_as_of': _HISTORY_AS_OF_MEMBERS + "SELECT COUNT(*) FROM members",
+
+    'department_stats_as_of': _as_of_department_stats(_HISTORY_AS_OF_MEMBERS),
+
+    'analytics_overview_as_of': _as_of_overview(_HISTORY_AS_OF_STAFF),
+
+    'department_breakdown_as_of': _as_of_breakdown(_HISTORY_AS_OF_STAFF, 'd.dept_no'),
+}
+
+# Variants of the current-state lookups that read the materialized
+# current_employee table (see current_state.py) instead of joining history
+_CURRENT_SEARCH_SELECT = """
+    SELECT emp_no, first_name, last_name, gender,
+           birth_date, hire_date, title, salary, dept_name
+    FROM current_employee
+"""
+
+_CURRENT_NAME_AFTER = """
+    AND (first_name, last_name, emp_no) > (?, ?, ?)
+    ORDER BY first_name, last_name, emp_no
+    LIMIT ?
+"""
+
+CURRENT_EMPLOYEE_QUERIES: Dict[str, str] = {
+    'employee_details': """
+        SELECT emp_no, first_name, last_name, gender, birth_date, hire_date,
+               title, salary, dept_name, manager_from
+        FROM current_employee
+        WHERE emp_no = ?
+    """,
+
+    'employees_by_department': """
+        SELECT emp_no, first_name, last_name, title, salary, hire_date,
+               CASE WHEN is_manager THEN 'Yes' ELSE 'No' END as is_manager
+        FROM current_employee
+        WHERE dept_name = ?
+        ORDER BY salary DESC, hire_date
+    """,
+
+    'department_rows': """
+        SELECT emp_no, first_name, last_name, title, salary, hire_date,
+               CASE WHEN is_manager THEN 'Yes' ELSE 'No' END as is_manager
+        FROM current_employee
+        WHERE dept_name = ?
+    """,
+
+    'department_count': "SELECT COUNT(*) FROM current_employee WHERE dept_name = ?",
+
+    'department_page': _department_seek_page("""
+        SELECT emp_no, first_name, last_name, title, salary, hire_date,
+               CASE WHEN is_manager THEN 'Yes' ELSE 'No' END as is_manager
+        FROM current_employee
+        WHERE dept_name = ?1
+    """),
+
+    # current_employee keeps a row for every employee; leavers have no department
+    'current_employees': _CURRENT_SEARCH_SELECT + """
+        WHERE dept_name IS NOT NULL
+        ORDER BY emp_no
+    """,
+
+    'current_employee_count': "SELECT COUNT(*) FROM current_employee WHERE dept_name IS NOT NULL",
+
+    'current_salaries': """
+        SELECT dept_name, title, gender, salary
+        FROM current_employee
+        WHERE salary IS NOT NULL
+    """,
+
+    'search_by_emp_no': _CURRENT_SEARCH_SELECT + """
+        WHERE emp_no = ?
+    """,
+
+    'search_by_name': _CURRENT_SEARCH_SELECT + """
+        WHERE LOWER(first_name) LIKE ? OR LOWER(last_name) LIKE ?
+        ORDER BY first_name, last_name
+        LIMIT 100
+    """,
+
+    'search_by_full_name': _CURRENT_SEARCH_SELECT + """
+        WHERE LOWER(first_name) LIKE ? AND LOWER(last_name) LIKE ?
+        ORDER BY first_name, last_name
+        LIMIT 100
+    """,
+
+    'search_by_name_page': _CURRENT_SEARCH_SELECT + """
+        WHERE (LOWER(first_name) LIKE ? OR LOWER(last_name) LIKE ?)
+    """ + _CURRENT_NAME_AFTER,
+
+    'search_by_full_name_page': _CURRENT_SEARCH_SELECT + """
+        WHERE LOWER(first_name) LIKE ? AND LOWER(last_name) LIKE ?
+    """ + _CURRENT_NAME_AFTER,
+
+    'search_by_name_fts_page': _CURRENT_SEARCH_SELECT + """
+        WHERE emp_no IN (SELECT rowid FROM employee_name_fts WHERE employee_name_fts MATCH ?)
+    """ + _CURRENT_NAME_AFTER,
+
+    'search_by_name_fts': _NAME_MATCHES + """
+        SELECT c.emp_no, c.first_name, c.last_name, c.gender,
+               c.birth_date, c.hire_date, c.title, c.salary, c.dept_name
+        FROM matches m
+        JOIN current_employee c ON c.emp_no = m.emp_no
+        ORDER BY m.rank, c.first_name, c.last_name
+    """,
+}
+
+
+# Department figures read from the dept_stats_current summary table (see
+# dept_stats.py). The aggregate over at most one row keeps the shape of the
+# original: one row, zeros for a department without employees
+DEPT_STATS_QUERIES: Dict[str, str] = {
+    'department_stats': """
+        SELECT COALESCE(MAX(employees), 0),
+               MAX(salary_sum * 1.0 / NULLIF(salary_count, 0)),
+               MAX(max_salary), MAX(min_salary),
+               COALESCE(MAX(managers), 0)
+        FROM dept_stats_current
+        WHERE dept_name = ?
+    """,
+
+    'department_breakdown': """
+        SELECT d.dept_name,
+               COALESCE(s.employees, 0),
+               s.salary_sum * 1.0 / NULLIF(s.salary_count, 0),
+               s.max_salary, s.min_salary,
+               COALESCE(s.managers, 0)
+        FROM departments d
+        LEFT JOIN dept_stats_current s ON s.dept_name = d.dept_name
+        ORDER BY d.dept_name
+    """,
+}
+
+
+class QueryRegistry:
+    """Named SQL statements with per-name call counts and timings
+
+    Python's sqlite3 keeps a per-connection cache of compiled statements
+    keyed on the exact SQL text, so handing out the same string for a name
+    means each statement is parsed and planned once per connection.
+    With a ResultCache, repeated calls on unchanged data skip SQLite
+    entirely; only calls that reach the database are timed, and passed on
+    to the QueryLog if there is one.
+    """
+
+    def __init__(self, queries: Dict[str, str] = QUERIES, cache: Optional[ResultCache] = None,
+                 log: Optional[QueryLog] = None):
+        self.queries = dict(queries)
+        self.cache = cache
+        self.log = log
+        self._lock = threading.Lock()
+        self._stats = {name: {'calls': 0, 'total_time': 0.0, 'max_time': 0.0}
+                       for name in self.queries}
+
+    def override(self, queries: Dict[str, str]):
+        """Replace the SQL behind existing names, e.g. with CURRENT_EMPLOYEE_QUERIES"""
+        unknown = set(queries) - set(self.queries)
+        if unknown:
+            raise KeyError(f"Unknown query names: {', '.join(sorted(unknown))}")
+        self.queries.update(queries)
+
+    def sql(self, name: str) -> str:
+        """Return the SQL text registered under name"""
+        return self.queries[name]
+
+    def execute(self, conn: sqlite3.Connection, name: str, params: tuple = ()) -> List[Tuple]:
+        """Run a named query on conn (or answer it from the cache)"""
+        if self.cache is not None:
+            return self.cache.fetch(
+                conn, self.queries[name], params, lambda: self._execute(conn, name, params)
+            )
+        return self._execute(conn, name, params)
+
+    def _execute(self, conn: sqlite3.Connection, name: str, params: tuple) -> List[Tuple]:
+        sql = self.queries[name]
+        start = time.perf_counter()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            elapsed = time.perf_counter() - start
+            self._record(name, elapsed)
+        if self.log is not None:
+            self.log.record(conn, sql, params, elapsed, len(rows))
+        return rows
+
+    def _record(self, name: str, elapsed: float):
+        with self._lock:
+            stats = self._stats[name]
+            stats['calls'] += 1
+            stats['total_time'] += elapsed
+            stats['max_time'] = max(stats['max_time'], elapsed)
+
+    def stats(self) -> Dict[str, dict]:
+        """Snapshot of calls, total/avg/max seconds for every named query"""
+        with self._lock:
+            return {
+                name: dict(s, avg_time=s['total_time'] / s['calls'] if s['calls'] else 0.0)
+                for name, s in self._stats.items()
+            }
+
+    def report(self) -> str:
+        """Format the statistics as a table ordered by total time"""
+        lines = [f"{'Query':<26}{'Calls':>8}{'Total ms':>12}{'Avg ms':>10}{'Max ms':>10}"]
+        ordered = sorted(self.stats().items(), key=lambda item: item[1]['total_time'], reverse=True)
+        for name, s in ordered:
+            lines.append(
+                f"{name:<26}{s['calls']:>8}{s['total_time'] * 1000:>12.2f}"
+                f"{s['avg_time'] * 1000:>10.2f}{s['max_time'] * 1000:>10.2f}"
+            )
+        return "\n".join(lines)
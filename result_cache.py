@@ -0,0 +1,112 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Offset of the 4-byte "file change counter" in the SQLite database header
+_CHANGE_COUNTER_OFFSET = 24
+
+
+def file_change_counter(db_file: str) -> Optional[int]:
+    """Read the database header's change counter, or None if it cannot be read"""
+    try:
+        with open(db_file, 'rb') as f:
+            f.seek(_CHANGE_COUNTER_OFFSET)
+            data = f.read(4)
+    except OSError:
+        return None
+    return int.from_bytes(data, 'big') if len(data) == 4 else None
+
+
+def is_cacheable(sql: str) -> bool:
+    """Only plain reads are cached; anything else runs straight through"""
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+class ResultCache:
+    """Bounded LRU cache of query results keyed on SQL text and parameters
+
+    Every lookup first checks that the database is unchanged, and the whole
+    cache is dropped if it is not:
+
+    * PRAGMA data_version moves on a connection whenever any *other*
+      connection (in this or another process) commits;
+    * Connection.total_changes moves with the connection's own writes;
+    * the header's file change counter moves on every commit in
+      rollback-journal mode, whichever connection made it.
+
+    Connections are tracked separately because data_version values are only
+    comparable on the same connection; one that has not been seen before
+    also clears the cache, since it cannot tell what happened earlier.
+    """
+
+    def __init__(self, db_file: Optional[str] = None, max_entries: int = 256, max_rows: int = 5000):
+        self.db_file = db_file
+        self.max_entries = max_entries
+        # Larger results are returned but not kept, so a few big listings
+        # cannot pin a lot of memory
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, tuple], List[Tuple]]" = OrderedDict()
+        self._seen: Dict[int, Tuple[int, int]] = {}
+        self._file_counter: Optional[int] = None
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _validate(self, conn: sqlite3.Connection):
+        """Clear the cache if the database may have changed (lock held)"""
+        token = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+        counter = file_change_counter(self.db_file) if self.db_file else None
+        if self._seen.get(id(conn)) != token or counter != self._file_counter:
+            self._seen[id(conn)] = token
+            self._file_counter = counter
+            self._invalidate()
+
+    def _invalidate(self):
+        self._generation += 1
+        if self._entries:
+            self._entries.clear()
+            self._stats['invalidations'] += 1
+
+    def fetch(self, conn: sqlite3.Connection, sql: str, params: tuple,
+              run: Callable[[], List[Tuple]]) -> List[Tuple]:
+        """Return the cached rows for (sql, params), or call run() and cache its rows"""
+        try:
+            key = (sql, tuple(params))
+            hash(key)
+        except TypeError:
+            return run()
+        if not is_cacheable(sql):
+            return run()
+
+        with self._lock:
+            self._validate(conn)
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return list(rows)
+            self._stats['misses'] += 1
+            generation = self._generation
+
+        rows = run()
+
+        with self._lock:
+            # A write during run() leaves the rows of unknown freshness
+            self._validate(conn)
+            if generation == self._generation and len(rows) <= self.max_rows:
+                self._entries[key] = list(rows)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+        return rows
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._invalidate()
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of hit, miss, eviction and invalidation counts"""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class SessionCache:
+    """Recently loaded login profiles, dropped whenever the database changes
+
+    PRAGMA data_version changes when another connection commits to the
+    file, and Connection.total_changes with the connection's own writes, so
+    a cached profile is only served while nothing has been written since it
+    was loaded. Checking them costs no table reads. As in ResultCache, the
+    values are tracked per connection since data_version is only comparable
+    on the connection that read it; a connection not seen before clears the
+    cache. The cache is shared between threads and guarded by a lock.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._profiles: "OrderedDict[int, dict]" = OrderedDict()
+        self._seen: Dict[int, Tuple[int, int]] = {}
+
+    def _check_version(self, conn: sqlite3.Connection):
+        """Clear the cache if the database may have changed (lock held)"""
+        token = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+        if self._seen.get(id(conn)) != token:
+            self._seen[id(conn)] = token
+            self._profiles.clear()
+
+    def get(self, conn: sqlite3.Connection, emp_no: int) -> Optional[dict]:
+        """Return the cached profile for emp_no, or None"""
+        with self._lock:
+            self._check_version(conn)
+            profile = self._profiles.get(emp_no)
+            if profile is not None:
+                self._profiles.move_to_end(emp_no)
+            return profile
+
+    def put(self, conn: sqlite3.Connection, emp_no: int, profile: dict):
+        with self._lock:
+            self._check_version(conn)
+            self._profiles[emp_no] = profile
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from query_log import QueryLog, calling_method
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class RowStream:
+    """Rows of one query, pulled from SQLite in fetchmany() batches
+
+    Iterate it for single rows or call batches() for lists of up to
+    batch_size rows; only one batch is held in Python at a time. Use it as a
+    context manager (or call close()) so the statement is reset and its read
+    snapshot released as soon as the consumer is done, even when it stops
+    early. The query only starts on the first fetch, so cancel() -- callable
+    from any thread -- can interrupt even the initial step; iteration then
+    ends quietly. With a QueryLog, the time spent in SQLite and the rows
+    read are recorded when the stream closes.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, sql: str, params: tuple = (),
+                 batch_size: int = DEFAULT_BATCH_SIZE, log: Optional[QueryLog] = None):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.conn = conn
+        self.batch_size = batch_size
+        self.rows_read = 0
+        self.fetch_time = 0.0
+        self.log = log
+        self._caller = calling_method() if log is not None else None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._sql = sql
+        self._params = params
+        self._started = False
+        self._cursor: Optional[sqlite3.Cursor] = conn.cursor()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def closed(self) -> bool:
+        return self._cursor is None
+
+    @property
+    def columns(self) -> List[str]:
+        """Result column names (starts the query if it has not run yet)"""
+        cursor = self._cursor
+        if cursor is not None and not self._started:
+            self._start(cursor)
+        if cursor is None or cursor.description is None:
+            return []
+        return [description[0] for description in cursor.description]
+
+    def _start(self, cursor: sqlite3.Cursor):
+        self._started = True
+        cursor.execute(self._sql, self._params)
+
+    def batches(self) -> Iterator[List[Tuple]]:
+        """Yield lists of rows until the result, or the stream, ends"""
+        try:
+            while not self._cancelled.is_set():
+                with self._lock:
+                    if self._cursor is None:
+                        return
+                    cursor = self._cursor
+                start = time.perf_counter()
+                try:
+                    if not self._started:
+                        self._start(cursor)
+                    rows = cursor.fetchmany(self.batch_size)
+                except sqlite3.OperationalError as e:
+                    if self._cancelled.is_set() and 'interrupted' in str(e):
+                        return
+                    raise
+                finally:
+                    self.fetch_time += time.perf_counter() - start
+                if not rows:
+                    return
+                self.rows_read += len(rows)
+                yield rows
+        finally:
+            self.close()
+
+    def __iter__(self) -> Iterator[Tuple]:
+        for batch in self.batches():
+            yield from batch
+
+    def cancel(self):
+        """Stop the stream from any thread, interrupting a fetch in progress"""
+        self._cancelled.set()
+        with self._lock:
+            if self._cursor is not None:
+                self.conn.interrupt()
+
+    def close(self):
+        """Reset the statement; safe to call more than once"""
+        with self._lock:
+            cursor, self._cursor = self._cursor, None
+        if cursor is not None:
+            cursor.close()
+            if self.log is not None and self._started:
+                self.log.record(self.conn, self._sql, self._params, self.fetch_time,
+                                self.rows_read, self._caller)
+
+    def __enter__(self) -> 'RowStream':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,309 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from db_migrations import database_argument
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+CURRENT = '9999-01-01'
+METRICS = ('headcount', 'hires', 'departures', 'payroll')
+# Month index past any real month: where intervals that are still current stop
+OPEN = 10 ** 9
+
+# dept_emp rows flagged as the employee's first (a hire) and last (a departure,
+# unless still current) stint
+_STINT_ROWS = """
+    SELECT de.emp_no, de.dept_no, de.from_date, de.to_date,
+           NOT EXISTS (SELECT 1 FROM dept_emp p
+                       WHERE p.emp_no = de.emp_no AND p.from_date < de.from_date) as first_stint,
+           NOT EXISTS (SELECT 1 FROM dept_emp n
+                       WHERE n.emp_no = de.emp_no AND n.to_date > de.to_date) as last_stint
+    FROM dept_emp de
+"""
+
+# A full build reads both tables in storage order; going through the to_date
+# index for every row would be several times slower
+_SALARY_ROWS = "SELECT emp_no, salary, from_date, to_date FROM salaries"
+
+
+# Dates repeat heavily across millions of rows, so each is parsed once
+@lru_cache(maxsize=None)
+def month_index(date) -> Optional[int]:
+    """Months since year 0 of a 'YYYY-MM-DD' date, or None if it is not one"""
+    try:
+        return int(date[:4]) * 12 + int(date[5:7]) - 1
+    except (TypeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def first_month_from(date) -> Optional[int]:
+    """Index of the first month whose 1st falls on or after date (OPEN for current rows)"""
+    if date == CURRENT:
+        return OPEN
+    month = month_index(date)
+    if month is None:
+        return None
+    return month if date[8:10] == '01' else month + 1
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def month_date(index: int) -> str:
+    return month_label(index) + "-01"
+
+
+class DepartmentSeries(NamedTuple):
+    """Monthly figures for one department
+
+    headcount and payroll (the sum of annual salaries) are taken on the 1st
+    of each month; hires and departures count employees joining or leaving
+    the company during the month, in the department they joined or left.
+    Transfers between departments move headcount and payroll only.
+    """
+    dept_name: str
+    headcount: List[int]
+    hires: List[int]
+    departures: List[int]
+    payroll: List[int]
+
+
+class MonthlySeries(NamedTuple):
+    first_month: int
+    departments: Dict[str, DepartmentSeries]
+
+    @property
+    def months(self) -> List[str]:
+        """'YYYY-MM' labels; the last month may still be incomplete"""
+        length = len(next(iter(self.departments.values())).headcount) if self.departments else 0
+        return [month_label(self.first_month + offset) for offset in range(length)]
+
+    def total(self) -> DepartmentSeries:
+        """All departments added together"""
+        columns = [[sum(values) for values in zip(*(getattr(series, metric)
+                                                    for series in self.departments.values()))]
+                   for metric in METRICS]
+        return DepartmentSeries('All departments', *columns)
+
+    def by_name(self, dept_name: str) -> DepartmentSeries:
+        for series in self.departments.values():
+            if series.dept_name == dept_name:
+                return series
+        raise KeyError(dept_name)
+
+
+def sweep(conn: sqlite3.Connection, since: Optional[int] = None) -> Tuple[Optional[int], Optional[int], Dict[str, Dict[str, List[int]]]]:
+    """Compute every metric from month `since` (default: the start of history) on
+
+    Only rows still open on the 1st of that month are read. Each interval
+    contributes a +1/-1 (or +salary/-salary) event at the months it starts
+    and stops covering, hires and departures an event at their month, and
+    one pass over the months in order accumulates the events into values.
+    Returns (first month, last month, {dept_no: {metric: values}}); the last
+    month is the one holding the latest date in the data.
+    """
+    if since is None:
+        since = 0
+        stint_rows = conn.execute(_STINT_ROWS)
+        salary_rows = conn.execute(_SALARY_ROWS)
+    else:
+        boundary = month_date(since)
+        stint_rows = conn.execute(_STINT_ROWS + " WHERE de.to_date >= ?", (boundary,))
+        salary_rows = conn.execute(_SALARY_ROWS + " WHERE to_date >= ?", (boundary,))
+
+    events: Dict[str, Dict[str, Dict[int, int]]] = defaultdict(
+        lambda: {metric: defaultdict(int) for metric in METRICS})
+    stints: Dict[int, List[Tuple[Dict[int, int], int, int]]] = defaultdict(list)
+    # The data's date range, kept as strings: comparing those is much cheaper
+    # than converting every row's dates
+    earliest, latest = CURRENT, ''
+    month_from = first_month_from
+
+    for emp_no, dept_no, from_date, to_date, first_stint, last_stint in stint_rows:
+        start, stop = month_from(from_date), month_from(to_date)
+        if start is None or stop is None:
+            continue
+        earliest = min(earliest, from_date)
+        latest = max(latest, from_date if stop == OPEN else to_date)
+        dept = events[dept_no]
+        if start < since:
+            start = since
+        if start < stop:
+            dept['headcount'][start] += 1
+            dept['headcount'][stop] -= 1
+            stints[emp_no].append((dept['payroll'], start, stop))
+        hired, left = month_index(from_date), month_index(to_date)
+        if first_stint and hired >= since:
+            dept['hires'][hired] += 1
+        if last_stint and stop != OPEN and left >= since:
+            dept['departures'][left] += 1
+
+    no_stints = ()
+    for emp_no, salary, from_date, to_date in salary_rows:
+        start, stop = month_from(from_date), month_from(to_date)
+        if start is None or stop is None:
+            continue
+        if from_date < earliest:
+            earliest = from_date
+        if stop == OPEN:
+            if from_date > latest:
+                latest = from_date
+        elif to_date > latest:
+            latest = to_date
+        if start < since:
+            start = since
+        if start >= stop or not salary:
+            continue
+        # Payroll goes to whichever department the employee was in at the time
+        for payroll, dept_start, dept_stop in stints.get(emp_no, no_stints):
+            low = start if start > dept_start else dept_start
+            high = stop if stop < dept_stop else dept_stop
+            if low < high:
+                payroll[low] += salary
+                payroll[high] -= salary
+
+    if not latest:
+        return None, None, {}
+    first, last = since or month_index(earliest), month_index(latest)
+
+    series = {}
+    for dept_no, metrics in events.items():
+        values = {}
+        for metric, deltas in metrics.items():
+            if metric in ('hires', 'departures'):
+                values[metric] = [deltas.get(month, 0) for month in range(first, last + 1)]
+                continue
+            running, column = 0, []
+            for month in range(first, last + 1):
+                running += deltas.get(month, 0)
+                column.append(running)
+            values[metric] = column
+        series[dept_no] = values
+    return first, last, series
+
+
+def data_fingerprint(conn: sqlite3.Connection) -> List[int]:
+    """Cheap marker of new history: highest rowid and number of current rows per table
+
+    Appended rows move the rowid and closing a current row moves the count;
+    corrections to old rows are not seen (rebuild the cache after those).
+    """
+    fingerprint = []
+    for table in ('dept_emp', 'salaries'):
+        fingerprint.append(conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0)
+        fingerprint.append(conn.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE to_date = '{CURRENT}'").fetchone()[0])
+    return fingerprint
+
+
+def default_cache_path(db_file: str) -> str:
+    """Per-database cache file in the temporary directory"""
+    path = os.path.abspath(db_file)
+    digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]
+    name = f"{os.path.splitext(os.path.basename(path))[0]}-{digest}.json"
+    return os.path.join(tempfile.gettempdir(), 'employee-timeseries', name)
+
+
+def _read_cache(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cache if cache.get('version') == CACHE_VERSION else None
+
+
+def _write_cache(path: str, cache: dict):
+    """Write atomically; a cache that cannot be written is only a slower next start"""
+    try:
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        # A private partial file, so concurrent writers cannot interleave
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory,
+                                         suffix='.part', delete=False) as f:
+            json.dump(cache, f, separators=(',', ':'))
+        os.replace(f.name, path)
+    except OSError as e:
+        logger.warning("Could not write time-series cache %s: %s", path, e)
+
+
+def monthly_series(conn: sqlite3.Connection, cache_path: str, rebuild: bool = False) -> MonthlySeries:
+    """Monthly series for every department, from the cache where possible
+
+    An unchanged database is answered from the cache file alone. When new
+    history has arrived only the last cached month, which may have been
+    incomplete, and the months after it are recomputed; earlier months are
+    kept as they were.
+    """
+    fingerprint = data_fingerprint(conn)
+    cache = None if rebuild else _read_cache(cache_path)
+
+    if cache is None or cache['fingerprint'] != fingerprint:
+        since = cache['last_month'] if cache else None
+        first, last, fresh = sweep(conn, since)
+        if cache and first is not None:
+            keep = since - cache['first_month']
+            departments = {}
+            for dept_no in set(cache['departments']) | set(fresh):
+                old = cache['departments'].get(dept_no, {})
+                new = fresh.get(dept_no, {})
+                departments[dept_no] = {
+                    metric: (old.get(metric, [0] * keep)[:keep] + new.get(metric, [0] * (last - since + 1)))
+                    for metric in METRICS
+                }
+            first = cache['first_month']
+        else:
+            departments = fresh
+        cache = {
+            'version': CACHE_VERSION, 'fingerprint': fingerprint,
+            'first_month': first, 'last_month': last, 'departments': departments,
+        }
+        _write_cache(cache_path, cache)
+
+    names = dict(conn.execute("SELECT dept_no, dept_name FROM departments"))
+    return MonthlySeries(cache['first_month'] or 0, {
+        dept_no: DepartmentSeries(names.get(dept_no, dept_no), *(values[metric] for metric in METRICS))
+        for dept_no, values in sorted(cache['departments'].items())
+    })
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Monthly headcount, hires, departures and payroll")
+    parser.add_argument('database', nargs='?', help="database file (default: employees_db*.db beside this script)")
+    parser.add_argument('--department', help="one department (default: all added together)")
+    parser.add_argument('--cache', help="cache file (default: in the temporary directory)")
+    parser.add_argument('--rebuild', action='store_true', help="ignore the cache and recompute everything")
+    args = parser.parse_args(argv)
+
+    db_file = database_argument(args.database)
+    conn = sqlite3.connect(db_file)
+    try:
+        series = monthly_series(conn, args.cache or default_cache_path(db_file), args.rebuild)
+    finally:
+        conn.close()
+
+    try:
+        chosen = series.by_name(args.department) if args.department else series.total()
+    except KeyError:
+        parser.error(f"Unknown department {args.department!r}")
+    print(f"{'Month':<9}{'Headcount':>11}{'Hires':>8}{'Departures':>12}{'Payroll':>18}")
+    for month, *values in zip(series.months, *(getattr(chosen, metric) for metric in METRICS)):
+        headcount, hires, departures, payroll = values
+        print(f"{month:<9}{headcount:>11,}{hires:>8,}{departures:>12,}{payroll:>18,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
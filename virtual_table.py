@@ -0,0 +1,408 @@
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from employee_data import EmployeeData
+
+
+class RowModel:
+    """Paged, sortable source of rows for a VirtualTable
+
+    Rows are fetched a page at a time and kept in a small LRU page cache.
+    Subclasses implement _count_rows, _fetch and, if needed, sort.
+    """
+
+    PAGE_SIZE = 200
+    MAX_CACHED_PAGES = 50
+    # True when _fetch is cheap enough to run on the Tk thread
+    synchronous = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages: "OrderedDict[int, List[Tuple]]" = OrderedDict()
+        self._count: Optional[int] = None
+        self.version = 0
+        self.sort_column: Optional[int] = None
+        self.descending = False
+
+    def _count_rows(self) -> int:
+        raise NotImplementedError
+
+    def _fetch(self, offset: int, limit: int) -> List[Tuple]:
+        raise NotImplementedError
+
+    def prepare(self) -> int:
+        """Count the rows and load the first page (blocking)"""
+        count = self._count_rows()
+        with self._lock:
+            self._count = count
+        self.load_page(0, self.version)
+        return count
+
+    def row_count(self) -> Optional[int]:
+        """Number of rows, or None until prepare() has run"""
+        return self._count
+
+    def missing_pages(self, offset: int, limit: int) -> List[int]:
+        """Pages covering rows [offset, offset + limit) that are not cached"""
+        first, last = offset // self.PAGE_SIZE, (offset + limit - 1) // self.PAGE_SIZE
+        with self._lock:
+            return [page for page in range(first, last + 1) if page not in self._pages]
+
+    def rows(self, offset: int, limit: int) -> List[Optional[Tuple]]:
+        """Cached rows in [offset, offset + limit); None marks rows still loading"""
+        result = []
+        with self._lock:
+            for index in range(offset, offset + limit):
+                page = self._pages.get(index // self.PAGE_SIZE)
+                if page is None:
+                    result.append(None)
+                    continue
+                self._pages.move_to_end(index // self.PAGE_SIZE)
+                position = index % self.PAGE_SIZE
+                result.append(page[position] if position < len(page) else None)
+        return result
+
+    def load_page(self, page: int, version: int):
+        """Fetch one page (blocking); dropped if the sort order changed meanwhile"""
+        rows = self._fetch(page * self.PAGE_SIZE, self.PAGE_SIZE)
+        with self._lock:
+            if version != self.version:
+                return
+            if len(rows) < self.PAGE_SIZE and self._count is not None:
+                # Rows were deleted since counting; never ask for the missing tail
+                self._count = min(self._count, page * self.PAGE_SIZE + len(rows))
+            self._pages[page] = rows
+            while len(self._pages) > self.MAX_CACHED_PAGES:
+                self._pages.popitem(last=False)
+
+    def sort(self, column: int, descending: bool):
+        """Change the ordering and forget every cached page"""
+        with self._lock:
+            self.sort_column = column
+            self.descending = descending
+            self.version += 1
+            self._pages.clear()
+
+
+class ListRowModel(RowModel):
+    """Row model over a list that is already in memory"""
+
+    synchronous = True
+
+    def __init__(self, rows: Sequence[Tuple]):
+        super().__init__()
+        self._rows = list(rows)
+
+    def _count_rows(self) -> int:
+        return len(self._rows)
+
+    def _fetch(self, offset: int, limit: int) -> List[Tuple]:
+        return self._rows[offset:offset + limit]
+
+    def sort(self, column: int, descending: bool):
+        # NULLs sort last in either direction
+        present = [row for row in self._rows if row[column] is not None]
+        missing = [row for row in self._rows if row[column] is None]
+        present.sort(key=lambda row: row[column], reverse=descending)
+        self._rows = present + missing
+        super().sort(column, descending)
+
+
+# Sort keys are ((column index, descending), ...) from the most significant column
+SortKey = Sequence[Tuple[int, bool]]
+
+
+class QueryRowModel(RowModel):
+    """Row model that pages through a SELECT by keyset rather than OFFSET
+
+    select_sql must not have an ORDER BY; ordering is appended per page so
+    sorting happens in SQLite, with NULLs last in either direction (as in
+    ListRowModel) and the first column breaking ties to keep pages stable.
+    Each page continues after the sort key of the last row of the page
+    before it; after a jump with the scrollbar, the key a page starts after
+    is looked up with a one-row probe of just the sort columns, skipping
+    forward from the nearest page already known. Queries go through EmployeeData.execute, so they
+    are timed in the query log and served from the result cache like every
+    other query.
+
+    pager(after, limit), when given, serves the default order instead, e.g.
+    EmployeeData.department_rows_after: after is the key of the last row
+    shown (default_order's columns, then the first one) or None at the top.
+    """
+
+    def __init__(self, data: EmployeeData, select_sql: str, count_sql: str,
+                 params: tuple = (), default_order: SortKey = (),
+                 pager: Optional[Callable[[Optional[tuple], int], List[Tuple]]] = None):
+        super().__init__()
+        self.data = data
+        self.select_sql = select_sql
+        self.count_sql = count_sql
+        self.params = params
+        self.default_order = tuple(default_order)
+        self.pager = pager
+        self._names: Optional[List[str]] = None
+        # Sort key of the last row of every page whose end is known
+        self._page_ends: Dict[int, tuple] = {}
+
+    def sort_key(self) -> List[Tuple[int, bool]]:
+        if self.sort_column is None:
+            key = list(self.default_order)
+        else:
+            key = [(self.sort_column, self.descending)]
+        if all(column != 0 for column, _ in key):
+            key.append((0, False))
+        return key
+
+    def sort(self, column: int, descending: bool):
+        super().sort(column, descending)
+        with self._lock:
+            self._page_ends.clear()
+
+    def _count_rows(self) -> int:
+        return self.data.execute(self.count_sql, self.params)[0][0]
+
+    def _column(self, index: int) -> str:
+        if self._names is None:
+            self._names = self.data.column_names(self.select_sql, self.params)
+        return '"' + self._names[index].replace('"', '""') + '"'
+
+    def _after(self, key: SortKey, values: Sequence) -> Tuple[str, list]:
+        """Condition (and its parameters) for the rows after `values` in key order"""
+        (column, descending), rest = key[0], key[1:]
+        name = self._column(column)
+        tail = self._after(rest, values[1:]) if rest else None
+        if values[0] is None:
+            # NULLs come last, so only rows that are NULL here can follow
+            if tail is None:
+                return "0", []
+            return f"({name} IS NULL AND {tail[0]})", tail[1]
+        condition = f"{name} {'<' if descending else '>'} ? OR {name} IS NULL"
+        params = [values[0]]
+        if tail is not None:
+            condition += f" OR ({name} = ? AND {tail[0]})"
+            params += [values[0]] + tail[1]
+        return f"({condition})", params
+
+    def _select(self, columns: str, key: SortKey, after: Optional[tuple], limit: int,
+                skip: int = 0) -> List[Tuple]:
+        sql = f"SELECT {columns} FROM ({self.select_sql})"
+        params = list(self.params)
+        if after is not None:
+            condition, after_params = self._after(key, after)
+            sql += f" WHERE {condition}"
+            params += after_params
+        order = ", ".join(f"{self._column(column)} {'DESC' if descending else 'ASC'} NULLS LAST"
+                          for column, descending in key)
+        return self.data.execute(f"{sql} ORDER BY {order} LIMIT ? OFFSET ?", tuple(params) + (limit, skip))
+
+    def _page_start(self, page: int, key: SortKey, version: int) -> Tuple[bool, Optional[tuple]]:
+        """(False, None) past the end, else (True, key of the last row before page)"""
+        if page == 0:
+            return True, None
+        with self._lock:
+            if version != self.version:
+                return False, None
+            if page - 1 in self._page_ends:
+                return True, self._page_ends[page - 1]
+            known = max((end for end in self._page_ends if end < page - 1), default=-1)
+            start = self._page_ends.get(known)
+
+        skip = (page - 1 - known) * self.PAGE_SIZE - 1
+        keys = self._select(", ".join(self._column(column) for column, _ in key), key, start, 1, skip)
+        if not keys:
+            return False, None
+        with self._lock:
+            if version == self.version:
+                self._page_ends[page - 1] = tuple(keys[0])
+        return True, tuple(keys[0])
+
+    def _fetch(self, offset: int, limit: int) -> List[Tuple]:
+        page = offset // self.PAGE_SIZE
+        with self._lock:
+            version = self.version
+            use_pager = self.pager is not None and self.sort_column is None
+        key = self.sort_key()
+        found, after = self._page_start(page, key, version)
+        if not found:
+            return []
+        rows = self.pager(after, limit) if use_pager else self._select("*", key, after, limit)
+        if len(rows) == limit:
+            with self._lock:
+                if version == self.version:
+                    self._page_ends[page] = tuple(rows[-1][column] for column, _ in key)
+        return rows
+
+
+class VirtualTable(tk.Frame):
+    """Treeview that only holds widget items for the rows on screen
+
+    The scrollbar and mouse wheel move a window over the RowModel; the
+    visible items are reused and refilled from the model's page cache, and
+    missing pages are loaded through the QueryExecutor.
+    """
+
+    ROW_HEIGHT = 22
+    HEADING_HEIGHT = 26
+
+    def __init__(self, parent, columns: Sequence[str], column_widths: Dict[str, int],
+                 executor=None, formatters: Optional[Dict[int, Callable]] = None,
+                 style: str = 'Custom.Treeview', **kwargs):
+        super().__init__(parent, **kwargs)
+        self.columns = tuple(columns)
+        self.executor = executor
+        self.formatters = formatters or {}
+        self.model: Optional[RowModel] = None
+        self.offset = 0
+        self.visible = 1
+        self._loading = set()
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings", style=style, height=1)
+        for index, col in enumerate(self.columns):
+            self.tree.heading(col, text=col, command=lambda i=index: self.sort_by(i))
+            self.tree.column(col, width=column_widths.get(col, 100), minwidth=50)
+
+        self.v_scrollbar = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+        h_scrollbar = ttk.Scrollbar(self, orient='horizontal', command=self.tree.xview)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
+
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.v_scrollbar.grid(row=0, column=1, sticky='ns')
+        h_scrollbar.grid(row=1, column=0, sticky='ew')
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+        self.tree.bind('<Prior>', lambda e: self.scroll(-self.visible))
+        self.tree.bind('<Next>', lambda e: self.scroll(self.visible))
+        self.tree.bind('<Home>', lambda e: self.scroll_to(0))
+        self.tree.bind('<End>', lambda e: self.scroll_to(self._count()))
+
+    def set_model(self, model: Optional[RowModel], on_ready: Optional[Callable[[int], None]] = None):
+        """Show a new model; on_ready(row_count) runs once it has been counted"""
+        self.model = model
+        self.offset = 0
+        self._loading.clear()
+        self._update_headings()
+        self.render()
+        if model is None:
+            return
+
+        def ready(count):
+            if model is self.model and self.winfo_exists():
+                self.render()
+                if on_ready:
+                    on_ready(count)
+
+        if model.synchronous or self.executor is None:
+            ready(model.prepare())
+        else:
+            self.executor.submit(model.prepare, on_result=ready)
+
+    def clear(self):
+        """Remove the model and every row"""
+        self.set_model(None)
+
+    def sort_by(self, column: int):
+        """Sort by a column, toggling the direction on repeated clicks"""
+        if self.model is None:
+            return
+        descending = self.model.sort_column == column and not self.model.descending
+        self.model.sort(column, descending)
+        self._loading.clear()
+        self._update_headings()
+        self.render()
+
+    def scroll(self, rows: int):
+        self.scroll_to(self.offset + rows)
+
+    def scroll_to(self, offset: int):
+        offset = max(0, min(offset, self._count() - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def render(self):
+        """Refill the on-screen items from the model's cache"""
+        count = self._count()
+        limit = max(0, min(self.visible, count - self.offset))
+        rows = self.model.rows(self.offset, limit) if limit else []
+
+        items = self.tree.get_children()
+        for item in items[len(rows):]:
+            self.tree.delete(item)
+        for index, row in enumerate(rows):
+            values = self._format(row) if row is not None else ("…",)
+            if index < len(items):
+                self.tree.item(items[index], values=values)
+            else:
+                self.tree.insert("", "end", values=values)
+
+        if count:
+            self.v_scrollbar.set(self.offset / count, (self.offset + limit) / count)
+        else:
+            self.v_scrollbar.set(0, 1)
+
+        if limit and None in rows:
+            self._load_missing(limit)
+
+    def _count(self) -> int:
+        if self.model is None:
+            return 0
+        return self.model.row_count() or 0
+
+    def _format(self, row: Tuple) -> Tuple:
+        if not self.formatters:
+            return row
+        return tuple(
+            self.formatters[i](value) if i in self.formatters and value is not None else value
+            for i, value in enumerate(row)
+        )
+
+    def _load_missing(self, limit: int):
+        model = self.model
+        for page in model.missing_pages(self.offset, limit):
+            key = (model.version, page)
+            if key in self._loading:
+                continue
+            self._loading.add(key)
+            if model.synchronous or self.executor is None:
+                model.load_page(page, model.version)
+                self._loading.discard(key)
+                self.render()
+            else:
+                self.executor.submit(
+                    model.load_page, page, model.version,
+                    on_result=lambda _, key=key: self._page_loaded(model, key)
+                )
+
+    def _page_loaded(self, model: RowModel, key: Tuple[int, int]):
+        self._loading.discard(key)
+        if model is self.model and self.winfo_exists():
+            self.render()
+
+    def _update_headings(self):
+        for index, col in enumerate(self.columns):
+            text = col
+            if self.model is not None and self.model.sort_column == index:
+                text += " ▼" if self.model.descending else " ▲"
+            self.tree.heading(col, text=text)
+
+    def _on_resize(self, event):
+        visible = max(1, (event.height - self.HEADING_HEIGHT) // self.ROW_HEIGHT)
+        if visible != self.visible:
+            self.visible = visible
+            self.offset = max(0, min(self.offset, self._count() - self.visible))
+            self.render()
+
+    def _on_scrollbar(self, action, *args):
+        if action == 'moveto':
+            self.scroll_to(int(float(args[0]) * self._count()))
+        elif action == 'scroll':
+            amount, unit = int(args[0]), args[1]
+            self.scroll(amount * (self.visible if unit == 'pages' else 1))